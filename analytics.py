@@ -0,0 +1,166 @@
+"""Registration analytics served from incremental rollups.
+
+Sign-ups are counted per hour and per day in registration_rollup_hourly and
+registration_rollup_daily, by event and by the attendee's semester and year.
+/admin/analytics and /api/v1/analytics read only those tables (joined to
+events for names and locations), so a report costs the same whether there
+are a thousand registrations or millions.
+
+compact() keeps the rollups current. A run recounts the hours from
+REWRITE_HOURS before the newest hourly bucket onwards, reading only the
+registrations created since then (idx_registrations_created_at), and then
+the days those hours fall in. Whole hours are recounted rather than
+incremented, so a failed or repeated run leaves the counts right, and late
+commits and cancellations within that window are picked up. Changes to older
+registrations, such as a cancellation last month, show up after a full
+recount:
+
+    python analytics.py                 # compact once
+    python analytics.py --rebuild       # recount every hour from scratch
+    python analytics.py --every 300     # keep compacting every 5 minutes
+
+The app also compacts on a background thread every
+ANALYTICS_COMPACT_INTERVAL seconds. Workers take turns through a lock on the
+rollup_state row.
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import db
+
+REWRITE_HOURS = 1
+COMPACT_INTERVAL = 300
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+# Reports over at most this many days are broken down per hour
+HOURLY_DAYS = 2
+TOP_EVENTS = 20
+
+logger = logging.getLogger(__name__)
+
+
+def compact(connection, rebuild=False, repository=None):
+    """Bring the rollups up to date in one transaction; returns the hourly rows written."""
+    analytics = repository or db.storage.analytics
+    cur = connection.cursor()
+    try:
+        analytics.compacted_at(cur, for_update=True)
+        start = None if rebuild else analytics.rollup_start(cur, REWRITE_HOURS)
+        written = analytics.rebuild_hours(cur, start)
+        analytics.rebuild_days(cur, start)
+        analytics.mark_compacted(cur)
+        connection.commit()
+        return written
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+class Compactor:
+    """Background thread running compact() every `interval` seconds."""
+
+    def __init__(self, interval=COMPACT_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def run(self):
+        while True:
+            try:
+                with db.pool.connection() as connection:
+                    compact(connection)
+            except Exception:
+                logger.exception("Analytics compaction failed")
+            time.sleep(self.interval)
+
+    def start(self):
+        """Start the thread once per process (lazily, so after any fork)."""
+        if self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self.run, name='analytics-compactor', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+
+
+def fill_gaps(timeline, step):
+    """[(bucket, sign-ups)] with the empty buckets between the first and last added."""
+    counts = {datetime.fromisoformat(str(bucket)): signups for bucket, signups in timeline}
+    if not counts:
+        return []
+    filled = []
+    bucket, last = min(counts), max(counts)
+    while bucket <= last:
+        filled.append((bucket, counts.get(bucket, 0)))
+        bucket += step
+    return filled
+
+
+def report(cur, days=DEFAULT_DAYS, event_id=None, repository=None):
+    """Sign-ups over the last `days` days, from the rollups, as JSON-ready data.
+
+    Times are the database's: UTC with SQLite, the server's time zone with MySQL.
+    """
+    analytics = repository or db.storage.analytics
+    if days <= HOURLY_DAYS:
+        grain, count, step, label = 'hour', days * 24, timedelta(hours=1), '%Y-%m-%d %H:00'
+    else:
+        grain, count, step, label = 'day', days, timedelta(days=1), '%Y-%m-%d'
+    timeline = fill_gaps(analytics.timeline(cur, grain, count, event_id), step)
+    compacted_at = analytics.compacted_at(cur)
+    return {
+        'days': days,
+        'event_id': event_id,
+        'grain': grain,
+        'compacted_at': str(compacted_at) if compacted_at is not None else None,
+        'total': sum(int(signups) for _, signups in timeline),
+        'timeline': [{'bucket': bucket.strftime(label), 'signups': int(signups)}
+                     for bucket, signups in timeline],
+        'by_cohort': [{'semester': semester or None, 'year': year or None, 'signups': int(signups)}
+                      for semester, year, signups in analytics.by_cohort(cur, grain, count, event_id)],
+        'by_location': [{'location': location, 'signups': int(signups)}
+                        for location, signups in analytics.by_location(cur, grain, count, event_id)],
+        'top_events': [{'id': id, 'name': name, 'location': location, 'signups': int(signups)}
+                       for id, name, location, signups
+                       in analytics.by_event(cur, grain, count, event_id, TOP_EVENTS)],
+    }
+
+
+def main():
+    from dotenv import load_dotenv
+    from storage import create as create_storage
+
+    parser = argparse.ArgumentParser(description="Compact the registration analytics rollups.")
+    parser.add_argument('--rebuild', action='store_true', help="recount every hour from scratch")
+    parser.add_argument('--every', type=float, metavar='SECONDS',
+                        help="keep running, compacting every SECONDS")
+    args = parser.parse_args()
+
+    load_dotenv()
+    store = create_storage(os.environ)
+    store.prepare()
+    rebuild = args.rebuild
+    while True:
+        connection = store.connect()
+        try:
+            written = compact(connection, rebuild, store.analytics)
+        finally:
+            connection.close()
+        print(f"Compacted {written} hourly rollup rows{' (full rebuild)' if rebuild else ''}.")
+        if not args.every:
+            break
+        rebuild = False
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main()
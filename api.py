@@ -0,0 +1,160 @@
+"""JSON API helpers: payload parsing, row serialisation and batch writes.
+
+The /api/v1 routes live in app.py; this module holds the parts that do not
+need the Flask app. Batch requests are all-or-nothing: every item is
+validated before anything is written, and the writes of one request share
+a single transaction, so a client either gets every item applied or an
+error and an unchanged database.
+"""
+import db
+
+MAX_BATCH = 500
+EVENT_FIELDS = ('name', 'date', 'time', 'location', 'capacity')
+
+
+class ApiError(Exception):
+    """An error answered as {"error": message, "details": ...} with the given status."""
+
+    def __init__(self, message, status=400, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+    def to_dict(self):
+        body = {'error': self.message}
+        if self.details is not None:
+            body['details'] = self.details
+        return body
+
+
+def json_body(request):
+    data = request.get_json(silent=True)
+    if not isinstance(data, (dict, list)):
+        raise ApiError("Expected a JSON object or array body")
+    return data
+
+
+def batch_items(data, key):
+    """(items, is_batch) from {key: [...]}, a bare list, or a single object."""
+    if isinstance(data, dict) and key in data:
+        data = data[key]
+        if not isinstance(data, list):
+            raise ApiError(f'"{key}" must be an array')
+    if isinstance(data, list):
+        if not data:
+            raise ApiError("Empty batch")
+        if len(data) > MAX_BATCH:
+            raise ApiError(f"At most {MAX_BATCH} items per request", 413)
+        if not all(isinstance(item, dict) for item in data):
+            raise ApiError("Every batch item must be a JSON object")
+        return data, True
+    return [data], False
+
+
+def id_list(data, key='ids'):
+    """Unique integer ids from {"ids": [...]}."""
+    ids = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids:
+        raise ApiError(f'Expected {{"{key}": [...]}} with at least one id')
+    if len(ids) > MAX_BATCH:
+        raise ApiError(f"At most {MAX_BATCH} ids per request", 413)
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ApiError("Ids must be integers")
+    return list(dict.fromkeys(ids))
+
+
+def text(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def event_values(item, validate, current=None):
+    """Validated (name, date, time, location, capacity) for an event payload.
+
+    With `current` (an existing event dict) missing fields keep their
+    values, for partial updates. Raises ValueError with a list of messages.
+    """
+    unknown = sorted(set(item) - set(EVENT_FIELDS))
+    if unknown:
+        raise ValueError([f"Unknown field(s): {', '.join(unknown)}"])
+    merged = dict(current or {}, **item)
+    name = text(merged.get('name')) or ''
+    date = text(merged.get('date')) or ''
+    time = text(merged.get('time')) or ''
+    location = text(merged.get('location'))
+    capacity = merged.get('capacity')
+    # Stored times come back as H:MM:SS; the validator wants HH:MM
+    if len(time) > 5 and time.count(':') == 2:
+        time = f"{int(time.split(':')[0]):02d}:{time.split(':')[1]}"
+
+    errors = []
+    if capacity is not None and (not isinstance(capacity, int) or isinstance(capacity, bool)):
+        errors.append("Capacity must be a whole number or null")
+        capacity = None
+    errors += validate(name, date, time, location, str(capacity) if capacity is not None else None)
+    if errors:
+        raise ValueError(errors)
+    return name, date, time, location, capacity
+
+
+def registration_values(item, validate):
+    """Validated (event_id, name, email) for a registration payload."""
+    event_id = item.get('event_id')
+    name = text(item.get('name')) or ''
+    email = text(item.get('email')) or ''
+    errors = []
+    if not isinstance(event_id, int) or isinstance(event_id, bool):
+        errors.append("event_id must be an integer")
+    errors += validate(name, email)
+    if errors:
+        raise ValueError(errors)
+    return event_id, name, email
+
+
+def validate_all(items, parse):
+    """Parse every item or raise one 422 listing the errors of each bad item."""
+    parsed, problems = [], []
+    for index, item in enumerate(items):
+        try:
+            parsed.append(parse(item))
+        except ValueError as e:
+            problems.append({'index': index, 'errors': e.args[0]})
+    if problems:
+        raise ApiError("Validation failed", 422, problems)
+    return parsed
+
+
+def event_dict(row, counts=None):
+    event = {
+        'id': row[0],
+        'name': row[1],
+        'date': str(row[2]),
+        'time': str(row[3]),
+        'location': row[4],
+        'capacity': row[5],
+    }
+    if counts is not None:
+        event['registered'], event['waitlisted'] = counts.get(row[0], (0, 0))
+    return event
+
+
+def registration_dict(row):
+    return {'id': row[0], 'event_id': row[1], 'user_id': row[2],
+            'name': row[3], 'email': row[4], 'status': row[5]}
+
+
+def create_events(cur, events):
+    """Insert events on an open transaction; returns their ids in order."""
+    return [db.storage.events.create(cur, *values) for values in events]
+
+
+def delete_events(cur, ids):
+    """Delete events by id on an open transaction; all must exist.
+
+    Registrations go with them (ON DELETE CASCADE).
+    """
+    found = db.storage.events.lock_capacities(cur, ids)
+    missing = [event_id for event_id in ids if event_id not in found]
+    if missing:
+        raise ApiError("Event(s) not found", 404, {'missing': missing})
+    db.storage.events.delete(cur, ids)
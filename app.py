@@ -1,14 +1,29 @@
-from flask import Flask, render_template, request, redirect, Response, flash, session, url_for, jsonify
-from flask_mysqldb import MySQL
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, Blueprint, render_template, request, redirect, Response, flash, session, url_for, jsonify
 from functools import wraps
 from dotenv import load_dotenv
-import MySQLdb
-from MySQLdb.cursors import DictCursor
 import os
 import re
+import hmac
+import base64
+import csv
 from datetime import datetime
 from itsdangerous import URLSafeTimedSerializer
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.exceptions import HTTPException
+from cache import create_cache, MemoryBackend
+import analytics
+import api
+import auth
+import db
+import metrics
+import ratelimit
+import export as export_engine
+import fragments
+import httpcache
+import registration_import
+import registrations as registration_service
+import search as search_engine
+from registration_queue import RegistrationQueue
 
 # Load environment variables
 load_dotenv()
@@ -17,16 +32,119 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your_fallback_secret_key')
 
-# Database Configuration
+# Database Configuration: DB_BACKEND=mysql (default) or sqlite (see storage.py)
+app.config['DB_BACKEND'] = os.getenv('DB_BACKEND', 'mysql')
+app.config['SQLITE_PATH'] = os.getenv('SQLITE_PATH')
+app.config['SQLITE_BUSY_TIMEOUT'] = float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))
 app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST')
 app.config['MYSQL_USER'] = os.getenv('MYSQL_USER')
 app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD')
 app.config['MYSQL_DB'] = os.getenv('MYSQL_DB')
 
-mysql = MySQL(app)
+# Connection pool (one per worker process)
+app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', 5))
+app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 3600))
+app.config['DB_POOL_PING_INTERVAL'] = int(os.getenv('DB_POOL_PING_INTERVAL', 30))
 
+db.init_app(app)
 
-def validate_event_input(name, date, time, location):
+# Instrumentation: statements slower than this are logged (params redacted)
+app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', 200))
+metrics.init_app(app)
+
+# Admission control: per-IP/account/route token buckets on the login and
+# registration POSTs (RATE_LIMIT_URL=redis://... shares them between workers),
+# and a cap on requests in progress that sheds overload with 429
+rate_limiter = ratelimit.RateLimiter(
+    ratelimit.create_buckets(os.getenv('RATE_LIMIT_URL')),
+    enabled=os.getenv('RATE_LIMITS', 'on').lower() not in ('0', 'off', 'false', 'no')
+)
+admission = ratelimit.ConcurrencyLimit(
+    int(os.getenv('MAX_CONCURRENT_REQUESTS', 4 * app.config['DB_POOL_SIZE'])),
+    wait=float(os.getenv('ADMISSION_WAIT', 0)),
+    exempt=('static', 'prometheus_metrics')
+)
+admission.init_app(app)
+
+# Event listing pagination
+EVENTS_PAGE_SIZE = int(os.getenv('EVENTS_PAGE_SIZE', 50))
+MAX_EVENTS_PAGE_SIZE = 200
+
+# Admin user list (storage.UserRepository never selects the password column)
+USERS_PAGE_SIZE = int(os.getenv('USERS_PAGE_SIZE', 100))
+
+# Rows per batch for streamed exports
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', export_engine.EXPORT_BATCH_SIZE))
+
+# Event cache (CACHE_URL=redis://... shares it between workers)
+event_cache = create_cache(os.getenv('CACHE_URL'), int(os.getenv('CACHE_TTL', 60)))
+
+# HTTP caching: the event pages answer repeat GETs with 304 until a write
+# bumps the data version; fingerprinted static files are cached for a year
+data_version = httpcache.DataVersion(
+    event_cache.backend,
+    shared=not isinstance(event_cache.backend, MemoryBackend),
+    window=event_cache.default_ttl
+)
+conditional_get = httpcache.conditional(data_version)
+httpcache.init_app(app)
+
+# Login: password hash parameters, concurrent hash limit and user cache. The
+# cache is keyed on credentials versions kept in the event cache backend, so
+# it is on by default only when that backend is shared (see auth.py)
+authenticator = auth.Authenticator(
+    hash_method=os.getenv('PASSWORD_HASH_METHOD'),
+    max_concurrent=int(os.getenv('AUTH_MAX_CONCURRENT_HASHES', 0)) or None,
+    wait_timeout=float(os.getenv('AUTH_HASH_WAIT', 2)),
+    cache_ttl=int(os.getenv('AUTH_CACHE_TTL', 30 if data_version.shared else 0)),
+    versions=event_cache.backend
+)
+
+# Templates: compiled bytecode is kept on disk (JINJA_CACHE_DIR, default a
+# per-user temp directory) so new workers skip parsing, and every template is
+# compiled at startup rather than on its first request
+if os.getenv('JINJA_CACHE_DIR'):
+    os.makedirs(os.getenv('JINJA_CACHE_DIR'), exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(os.getenv('JINJA_CACHE_DIR') or None)
+for template_name in app.jinja_env.list_templates(extensions=['html']):
+    app.jinja_env.get_template(template_name)
+
+# Rendered event cards and rows, reused until the event row changes
+fragment_cache = fragments.FragmentCache(app.jinja_env)
+
+@app.template_global()
+def event_fragment(macro, event):
+    return fragment_cache.render(macro, event)
+
+# Registration analytics: a background thread compacts the sign-up rollups
+# every ANALYTICS_COMPACT_INTERVAL seconds (0: run `python analytics.py` instead)
+analytics_compactor = None
+ANALYTICS_COMPACT_INTERVAL = int(os.getenv('ANALYTICS_COMPACT_INTERVAL', analytics.COMPACT_INTERVAL))
+if ANALYTICS_COMPACT_INTERVAL:
+    analytics_compactor = analytics.Compactor(ANALYTICS_COMPACT_INTERVAL)
+
+    @app.before_request
+    def start_analytics_compactor():
+        analytics_compactor.start()
+
+# Write-behind registration queue (opt-in): sign-ups are acknowledged once they
+# are on the local queue file and written to MySQL in batches by a worker thread
+registration_queue = None
+if os.getenv('REGISTRATION_QUEUE'):
+    registration_queue = RegistrationQueue(
+        os.getenv('REGISTRATION_QUEUE'),
+        batch_size=int(os.getenv('REGISTRATION_QUEUE_BATCH_SIZE', 500)),
+        on_write=data_version.bump
+    )
+
+    @app.before_request
+    def start_registration_worker():
+        # Also drains tickets left over from before a restart
+        registration_queue.start_worker()
+
+
+def validate_event_input(name, date, time, location, capacity=None):
     errors = []
     
     if not name or len(name.strip()) == 0:
@@ -46,6 +164,13 @@ def validate_event_input(name, date, time, location):
     
     if location and len(location) > 150:
         errors.append("Location must be less than 150 characters")
+
+    if capacity:
+        try:
+            if int(capacity) < 0:
+                errors.append("Capacity cannot be negative")
+        except ValueError:
+            errors.append("Capacity must be a whole number")
     
     return errors
 
@@ -64,6 +189,160 @@ def validate_registration_input(name, email):
     
     return errors
 
+def encode_event_cursor(event):
+    """Encode the (date, time, id) sort key of an event row as an opaque cursor."""
+    key = f"{event[2]}|{event[3]}|{event[0]}"
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+def decode_event_cursor(token):
+    """Decode a cursor produced by encode_event_cursor, or return None if it is invalid."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date, time, event_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        datetime.strptime(date, '%Y-%m-%d')
+        if not re.match(r'^\d{1,3}:\d{2}:\d{2}$', time):
+            return None
+        return date, time, int(event_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def parse_event_filters(args):
+    """The date-range and location filters in the query string, and any errors."""
+    filters, errors = {}, []
+    for field in ('date_from', 'date_to'):
+        value = (args.get(field) or '').strip()
+        if value:
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+                filters[field] = value
+            except ValueError:
+                errors.append(f"Invalid {field.replace('_', ' ')}: use YYYY-MM-DD")
+    location = (args.get('location') or '').strip()
+    if location:
+        filters['location'] = location[:150]
+    return filters, errors
+
+def get_event_filters(args):
+    """Read the date-range and location filters from the query string."""
+    filters, errors = parse_event_filters(args)
+    for error in errors:
+        flash(f"Ignoring {error[0].lower()}{error[1:]}", 'warning')
+    return filters
+
+def get_user_filters(args):
+    """Read the semester and year filters for the user list and roster export."""
+    filters = {}
+    for field in ('semester', 'year'):
+        value = (args.get(field) or '').strip()
+        if value:
+            try:
+                filters[field] = int(value)
+            except ValueError:
+                flash(f"Ignoring invalid {field}: use a whole number", 'warning')
+    return filters
+
+def get_analytics_window(args):
+    """(days, event_id) for an analytics report; bad values fall back to the defaults."""
+    try:
+        days = max(1, min(int(args.get('days', analytics.DEFAULT_DAYS)), analytics.MAX_DAYS))
+    except ValueError:
+        days = analytics.DEFAULT_DAYS
+    try:
+        event_id = int(args['event_id']) if args.get('event_id') else None
+    except ValueError:
+        event_id = None
+    return days, event_id
+
+def get_page_size(args):
+    try:
+        size = int(args.get('per_page', EVENTS_PAGE_SIZE))
+    except ValueError:
+        size = EVENTS_PAGE_SIZE
+    return max(1, min(size, MAX_EVENTS_PAGE_SIZE))
+
+def fetch_events_page(cur, filters, after=None, limit=EVENTS_PAGE_SIZE):
+    """Fetch one page of events ordered by (date, time, id); returns (events, next_cursor).
+
+    Keyset-paginated (see EventRepository.page): the cursor encodes the sort
+    key of the last row.
+    """
+    # Fetch one extra row to know whether there is a next page
+    events = db.storage.events.page(cur, filters, after, limit + 1)
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_event_cursor(events[-1])
+    return events, next_cursor
+
+def get_events_page(filters, after=None, limit=EVENTS_PAGE_SIZE):
+    """Cached fetch_events_page."""
+    def load():
+        with db.cursor() as cur:
+            return fetch_events_page(cur, filters, after, limit)
+    key = repr((sorted(filters.items()), after, limit))
+    return event_cache.get_or_set('event_lists', key, load)
+
+def get_registration_counts(event_ids):
+    """{event_id: (registered, waitlisted)} for a page of events.
+
+    Read from the trigger-maintained event_registration_counts table (one
+    primary-key lookup per event) and never cached, so the cached listings
+    still show live seat counts.
+    """
+    if not event_ids:
+        return {}
+    with db.cursor() as cur:
+        return db.storage.events.counts(cur, event_ids)
+
+def current_attendee():
+    """(column, value) identifying the logged-in user's registrations, or None."""
+    if 'user_id' in session:
+        return 'user_id', session['user_id']
+    if 'email' in session:
+        # Sessions from before user_id was stored at login
+        return 'email', session['email']
+    return None
+
+def get_user_registrations(event_ids):
+    """{event_id: status} of the logged-in user's registrations among event_ids, in one query."""
+    attendee = current_attendee()
+    if not event_ids or not attendee:
+        return {}
+    column, value = attendee
+    with db.cursor() as cur:
+        return db.storage.registrations.statuses(cur, column, value, event_ids)
+
+@app.template_global()
+def fill_percent(registered, capacity):
+    """Share of seats taken, 0-100, or None for unlimited events."""
+    if capacity is None:
+        return None
+    if capacity <= 0:
+        return 100
+    return min(100, round(registered * 100 / capacity))
+
+def get_event(event_id):
+    """Cached lookup of a single event row, or None if it does not exist."""
+    def load():
+        with db.cursor() as cur:
+            return db.storage.events.get(cur, event_id)
+    return event_cache.get_or_set('events', event_id, load)
+
+def invalidate_event_cache(event_id=None):
+    """Called by the event write routes so readers never see stale listings."""
+    event_cache.invalidate('event_lists')
+    if event_id is not None:
+        event_cache.forget('events', event_id)
+        fragment_cache.forget(event_id)
+    data_version.bump()
+
+def record_registration(status):
+    """Bump the data version when a registration was actually written."""
+    if status in (registration_service.REGISTERED, registration_service.WAITLISTED):
+        data_version.bump()
+
 # Authentication Routes
 @app.route('/register_user', methods=['GET', 'POST'])
 def register_user():
@@ -83,16 +362,10 @@ def register_user():
             flash('Please fill all required fields.', 'danger')
             return redirect(url_for('register_user'))
 
-        hashed_password = generate_password_hash(password)
-
         try:
-            cur = mysql.connection.cursor()
-            cur.execute(
-                "INSERT INTO users (registration_number, name, email, password, semester, year) VALUES (%s, %s, %s, %s, %s, %s)",
-                (registration_number, name, email, hashed_password, semester, year)
-            )
-            mysql.connection.commit()
-            cur.close()
+            hashed_password = authenticator.hash_password(password)
+            with db.transaction() as cur:
+                db.storage.users.create(cur, registration_number, name, email, hashed_password, semester, year)
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('login'))
         except Exception as e:
@@ -102,6 +375,10 @@ def register_user():
     return render_template('register_user.html')
 
 @app.route('/', methods=['GET', 'POST'])
+@rate_limiter.limit(
+    ratelimit.Limit('login_ip', 20, 60, ratelimit.client_ip),
+    ratelimit.Limit('login_account', 5, 60, ratelimit.form_field_from_client('email'))
+)
 def login():
     if request.method == 'POST':
         email = request.form['email']
@@ -114,13 +391,15 @@ def login():
             return redirect(url_for('index'))
 
         # Check in the database for normal user
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
-        user = cursor.fetchone()
-        cursor.close()
+        try:
+            user = authenticator.authenticate(email, password_input)
+        except auth.HashingBusy:
+            flash('Too many sign-ins right now. Please try again in a moment.', 'warning')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
 
-        if user and check_password_hash(user['password'], password_input):
+        if user:
             session['logged_in'] = True
+            session['user_id'] = user['id']
             session['email'] = user['email']
             session['name'] = user['name']
             return redirect(url_for('user_dashboard'))
@@ -140,15 +419,17 @@ from itsdangerous import URLSafeTimedSerializer
 # Add these routes to your existing Flask app
 
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@rate_limiter.limit(
+    ratelimit.Limit('forgot_password_ip', 5, 60, ratelimit.client_ip),
+    ratelimit.Limit('forgot_password_account', 3, 900, ratelimit.form_field('email')),
+    ratelimit.Limit('forgot_password_route', 60, 60, ratelimit.route)
+)
 def forgot_password():
     if request.method == 'POST':
         email = request.form.get('email')
         
         # Check if email exists in database
-        cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
-        user = cursor.fetchone()
-        cursor.close()
+        user = authenticator.find_user(email)
         
         if user:
             token = generate_token(email)
@@ -170,10 +451,7 @@ def reset_password(token):
         return redirect(url_for('forgot_password'))
     
     # Verify user exists
-    cursor = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cursor.execute('SELECT * FROM users WHERE email = %s', (email,))
-    user = cursor.fetchone()
-    cursor.close()
+    user = authenticator.find_user(email)
     
     if not user:
         flash('User not found.', 'danger')
@@ -187,14 +465,7 @@ def reset_password(token):
             flash('Passwords do not match!', 'danger')
         else:
             try:
-                hashed_password = generate_password_hash(password)
-                cursor = mysql.connection.cursor()
-                cursor.execute(
-                    "UPDATE users SET password = %s WHERE email = %s",
-                    (hashed_password, email)
-                )
-                mysql.connection.commit()
-                cursor.close()
+                authenticator.set_password(email, password)
                 flash('Password updated successfully! You can now login.', 'success')
                 return redirect(url_for('login'))
             except Exception as e:
@@ -220,16 +491,19 @@ def verify_token(token, expiration=3600):
         return None
 # Event Routes
 @app.route('/admin')
+@conditional_get
 def index():
+    filters = get_event_filters(request.args)
+    after = decode_event_cursor(request.args.get('after'))
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT * FROM events ORDER BY date")
-        events = cur.fetchall()
-        cur.close()
-        return render_template('index.html', events=events)
+        events, next_cursor = get_events_page(filters, after, get_page_size(request.args))
+        counts = get_registration_counts([event[0] for event in events])
+        return render_template('index.html', events=events, counts=counts, filters=filters,
+                               next_cursor=next_cursor, is_first_page=after is None)
     except Exception as e:
         flash(f"Error fetching events: {str(e)}", 'error')
-        return render_template('index.html', events=[])
+        return render_template('index.html', events=[], counts={}, filters=filters,
+                               next_cursor=None, is_first_page=True)
 
 @app.route('/add', methods=['POST'])
 def add_event():
@@ -237,19 +511,21 @@ def add_event():
     date = request.form['date']
     time = request.form['time']
     location = request.form['location']
+    capacity = request.form.get('capacity', '').strip()
 
-    input_errors = validate_event_input(name, date, time, location)
+    input_errors = validate_event_input(name, date, time, location, capacity)
     if input_errors:
         for error in input_errors:
             flash(error, 'error')
         return redirect('/admin')
 
+    # Blank capacity means unlimited
+    capacity = int(capacity) if capacity else None
+
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("INSERT INTO events (name, date, time, location) VALUES (%s, %s, %s, %s)", 
-                   (name, date, time, location))
-        mysql.connection.commit()
-        cur.close()
+        with db.transaction() as cur:
+            db.storage.events.create(cur, name, date, time, location, capacity)
+        invalidate_event_cache()
         flash("Event added successfully!", 'success')
     except Exception as e:
         flash(f"Error adding event: {str(e)}", 'error')
@@ -258,18 +534,37 @@ def add_event():
 
 @app.route('/update', methods=['POST'])
 def update_event():
-    event_id = request.form['id']
+    # Cache entries are keyed by the integer id, as readers look them up
+    try:
+        event_id = int(request.form['id'])
+    except ValueError:
+        flash("Invalid event id", 'error')
+        return redirect(url_for('index'))
     name = request.form['name']
     date = request.form['date']
+    time = request.form['time']
     location = request.form['location']
+    capacity = request.form.get('capacity', '').strip()
+
+    input_errors = validate_event_input(name, date, time, location, capacity)
+    if input_errors:
+        for error in input_errors:
+            flash(error, 'error')
+        return redirect(url_for('index'))
+
+    # Blank capacity means unlimited
+    capacity = int(capacity) if capacity else None
 
     try:
-        cursor = mysql.connection.cursor()
-        query = "UPDATE events SET name=%s, date=%s, location=%s WHERE id=%s"
-        cursor.execute(query, (name, date, location, event_id))
-        mysql.connection.commit()
-        cursor.close()
+        with db.transaction() as cursor:
+            db.storage.events.update(cursor, event_id, name=name, date=date, time=time,
+                                     location=location, capacity=capacity)
+            # A larger (or removed) capacity frees seats for the waitlist
+            promoted = registration_service.promote_waitlist(cursor, event_id)
+        invalidate_event_cache(event_id)
         flash("Event updated successfully!", 'success')
+        if promoted:
+            flash(f"{promoted} waitlisted attendee(s) moved into open seats.", 'info')
     except Exception as e:
         flash(f"Error updating event: {str(e)}", 'error')
         
@@ -278,10 +573,9 @@ def update_event():
 @app.route('/delete/<int:event_id>')
 def delete_event(event_id):
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("DELETE FROM events WHERE id = %s", (event_id,))
-        mysql.connection.commit()
-        cur.close()
+        with db.transaction() as cur:
+            db.storage.events.delete(cur, [event_id])
+        invalidate_event_cache(event_id)
         flash("Event deleted successfully!", 'success')
     except Exception as e:
         flash(f"Error deleting event: {str(e)}", 'error')
@@ -290,6 +584,10 @@ def delete_event(event_id):
 
 # Registration Routes
 @app.route('/register', methods=['POST'])
+@rate_limiter.limit(
+    ratelimit.Limit('register_ip', 10, 60, ratelimit.client_ip),
+    ratelimit.Limit('register_account', 5, 60, ratelimit.form_field_from_client('email'))
+)
 def register():
     event_id = request.form['event_id']
     name = request.form['name']
@@ -302,123 +600,481 @@ def register():
         return redirect('/')
 
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("INSERT INTO registrations (event_id, name, email) VALUES (%s, %s, %s)", 
-                    (event_id, name, email))
-        mysql.connection.commit()
-        cur.close()
-        flash("Registration successful!", 'success')
+        if registration_queue:
+            flash_queued_registration(registration_queue.enqueue(event_id, name, email))
+        else:
+            status = registration_service.register_attendee(db.get_connection(), event_id, name, email)
+            record_registration(status)
+            flash_registration_result(status)
     except Exception as e:
         flash(f"Error registering for event: {str(e)}", 'error')
     
     return redirect('/')
 
+REGISTRATION_MESSAGES = {
+    registration_service.REGISTERED: ("Successfully registered for the event!", "success"),
+    registration_service.WAITLISTED: ("This event is full. You have been added to the waitlist.", "info"),
+    registration_service.DUPLICATE: ("You have already registered for this event.", "warning"),
+    registration_service.NOT_FOUND: ("Event not found.", "warning"),
+}
+
+def flash_registration_result(status):
+    flash(*REGISTRATION_MESSAGES[status])
+
+def queued_registration_message(ticket):
+    return (f"Registration received and is being processed. Ticket: {ticket}", "info")
+
+def flash_queued_registration(ticket):
+    flash(*queued_registration_message(ticket))
+
+# Shared with rush.py, which serves this route without entering Flask
+REGISTER_EVENT_LIMITS = (
+    ratelimit.Limit('register_event_ip', 60, 60, ratelimit.client_ip),
+    ratelimit.Limit('register_event_account', 10, 60, ratelimit.session_account)
+)
+
 @app.route('/register_event/<int:event_id>', methods=['POST'])
+@rate_limiter.limit(*REGISTER_EVENT_LIMITS)
 def register_event(event_id):
     try:
-        cur = mysql.connection.cursor()
-
-        # Check if already registered
-        cur.execute("SELECT * FROM registrations WHERE event_id = %s AND email = %s", 
-                    (event_id, session['email']))
-        if cur.fetchone():
-            flash("You have already registered for this event.", "warning")
-            return redirect(url_for('user_dashboard'))
-
-        cur.execute(
-            "INSERT INTO registrations (event_id, name, email) VALUES (%s, %s, %s)",
-            (event_id, session['name'], session['email'])
-        )
-        mysql.connection.commit()
-        cur.close()
-        flash("Successfully registered for the event!", "success")
+        if registration_queue:
+            flash_queued_registration(
+                registration_queue.enqueue(event_id, session['name'], session['email']))
+        else:
+            # One conditional INSERT; the unique (event_id, email) index rejects duplicates
+            status = registration_service.register_attendee(
+                db.get_connection(), event_id, session['name'], session['email'])
+            record_registration(status)
+            flash_registration_result(status)
     except Exception as e:
         flash(f"Error: {str(e)}", "danger")
     
     return redirect(url_for('user_dashboard'))
 
 @app.route('/view_registration/<int:event_id>')
-
+@conditional_get
 def view_event_registrations(event_id):
     try:
-        cur = mysql.connection.cursor()
-
         # Get event details
-        cur.execute("SELECT * FROM events WHERE id = %s", (event_id,))
-        event = cur.fetchone()
+        event = get_event(event_id)
 
         if not event:
             flash("Event not found.", "warning")
             return redirect(url_for('index'))
 
         # Fetch registrations for the event
-        cur.execute("""
-            SELECT registrations.id, registrations.name, registrations.email
-            FROM registrations
-            WHERE registrations.event_id = %s
-        """, (event_id,))
-        registrations = cur.fetchall()
-        cur.close()
+        with db.cursor() as cur:
+            registrations = db.storage.registrations.for_event(cur, event_id)
 
         return render_template("view_event_registrations.html", event=event, registrations=registrations)
     except Exception as e:
         flash(f"Error: {str(e)}", "danger")
         return redirect(url_for('index'))
 
+@app.route('/admin/import', methods=['GET', 'POST'])
+def import_registrations():
+    if request.method == 'GET':
+        return render_template('import_registrations.html', report=None)
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash("Please choose a CSV file to import.", 'warning')
+        return redirect(url_for('import_registrations'))
+
+    try:
+        rows = registration_import.read_rows(upload.stream)
+        report = registration_import.import_registrations(
+            db.get_connection(), rows, validate_registration_input)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        flash(f"Could not read CSV file: {str(e)}", 'danger')
+        return redirect(url_for('import_registrations'))
+
+    summary = registration_import.summarize(report)
+    data_version.bump()
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(summary=summary, rows=report)
+    return render_template('import_registrations.html', report=report, summary=summary)
+
+@app.route('/admin/analytics')
+def analytics_report():
+    """Sign-ups over time, by semester/year, location and event, from the rollups."""
+    days, event_id = get_analytics_window(request.args)
+    try:
+        with db.cursor() as cur:
+            report = analytics.report(cur, days, event_id)
+    except Exception as e:
+        flash(f"Error loading analytics: {str(e)}", 'error')
+        report = None
+    if request.accept_mimetypes.best == 'application/json' and report is not None:
+        return jsonify(report)
+    return render_template('analytics.html', report=report, days=days, event_id=event_id)
+
 # User and Admin Dashboards
 @app.route('/dashboard')
-
+@conditional_get
 def user_dashboard():
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT * FROM events ORDER BY date, time")
-        events = cur.fetchall()
-        cur.close()
-        return render_template('dashboard.html', events=events)
+        filters = get_event_filters(request.args)
+        after = decode_event_cursor(request.args.get('after'))
+        events, next_cursor = get_events_page(filters, after, get_page_size(request.args))
+        event_ids = [event[0] for event in events]
+        counts = get_registration_counts(event_ids)
+        applied_events = get_user_registrations(event_ids)
+        return render_template('dashboard.html', events=events, counts=counts,
+                               applied_events=applied_events, filters=filters,
+                               next_cursor=next_cursor, is_first_page=after is None)
         flash(f"Error fetching events:", 'danger')
         return redirect('/')
 
+@app.route('/my_events')
+@conditional_get
+def my_events():
+    """The logged-in user's registrations, one joined and keyset-paginated query per page."""
+    attendee = current_attendee()
+    if not attendee:
+        flash("Please log in to see your events.", "warning")
+        return redirect(url_for('login'))
+    column, value = attendee
+    after = decode_event_cursor(request.args.get('after'))
+    limit = get_page_size(request.args)
+
+    try:
+        with db.cursor() as cur:
+            events = db.storage.registrations.events_for(cur, column, value, after, limit + 1)
+    except Exception as e:
+        flash(f"Error fetching your events: {str(e)}", 'danger')
+        return redirect(url_for('user_dashboard'))
+
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_event_cursor(events[-1])
+    return render_template('my_events.html', events=events, next_cursor=next_cursor,
+                           is_first_page=after is None)
+
 @app.route("/users")
 
 def view_users():
+    """One page of users ordered by id, optionally filtered by semester and year."""
+    filters = get_user_filters(request.args)
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT * FROM users ORDER BY id")
-        users = cur.fetchall()
-        cur.close()
-        
-        if not users:
-            flash("No users found.", "warning")
-        
-        return render_template("users.html", users=users)
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        after = 0
+    try:
+        limit = max(1, min(int(request.args.get('per_page', USERS_PAGE_SIZE)), MAX_EVENTS_PAGE_SIZE))
+    except ValueError:
+        limit = USERS_PAGE_SIZE
+
+    try:
+        with db.cursor() as cur:
+            users = db.storage.users.page(cur, filters, after, limit + 1)
     except Exception as e:
         flash(f"Error fetching users: {str(e)}", 'error')
         return redirect('/')
 
+    next_after = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_after = users[-1][0]
+    if not users and not after:
+        flash("No users found.", "warning")
+    return render_template("users.html", users=users, filters=filters,
+                           next_after=next_after, is_first_page=not after)
+
+# Search
+@app.route('/search')
+def search():
+    """Full-text search; JSON for ?format=json or an Accept: application/json client."""
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('kind', 'events')
+    if kind not in search_engine.KINDS:
+        kind = 'events'
+    try:
+        page = max(1, min(int(request.args.get('page', 1)), search_engine.MAX_SEARCH_PAGE))
+    except ValueError:
+        page = 1
+    wants_json = (request.args.get('format') == 'json'
+                  or request.accept_mimetypes.best == 'application/json')
+
+    rows, has_next = [], False
+    message, category, status = None, None, 200
+    if query and not search_engine.terms(query):
+        message, category = (f"Enter a word of at least {search_engine.MIN_TERM_LENGTH} characters "
+                             "other than common words such as 'the' or 'com'."), 'warning'
+    elif query:
+        try:
+            with db.cursor() as cur:
+                rows, has_next = search_engine.search(cur, kind, query, page)
+        except Exception as e:
+            message, category, status = f"Search failed: {str(e)}", 'danger', 500
+
+    if wants_json:
+        body = dict(query=query, kind=kind, page=page, has_next=has_next,
+                    results=search_engine.as_dicts(kind, rows))
+        if message:
+            body['error'] = message
+        return jsonify(body), status
+    if message:
+        flash(message, category)
+    return render_template('search.html', query=query, kind=kind, kinds=list(search_engine.KINDS),
+                           rows=rows, page=page, has_next=has_next)
+
 # Data Export
 @app.route('/export')
+@app.route('/export/<dataset>')
+
+def export(dataset='events'):
+    if dataset not in export_engine.EXPORTS:
+        flash(f"Unknown export: {dataset}", 'error')
+        return redirect('/')
+    fmt = request.args.get('format', 'csv')
+    if fmt not in export_engine.FORMATS:
+        flash(f"Unsupported export format: {fmt}", 'error')
+        return redirect('/')
 
-def export():
+    columns, header = export_engine.EXPORTS[dataset]
+    filters = get_user_filters(request.args)
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT * FROM events ORDER BY date")
-        events = cur.fetchall()
-        cur.close()
-
-        output = []
-        output.append(['ID', 'Name', 'Date', 'Location'])
-        for event in events:
-            output.append([event[0], event[1], event[2], event[3]])
-
-        csv_output = '\n'.join([','.join(map(str, row)) for row in output])
-
-        return Response(
-            csv_output, 
-            mimetype="text/csv", 
-            headers={"Content-Disposition": "attachment;filename=events.csv"}
-        )
+        # A server-side cursor ties up its connection until the last row is
+        # read, so the export checks out a pooled connection of its own and
+        # returns it when the response is closed
+        conn = db.pool.acquire()
+        try:
+            cur = export_engine.open_export(conn, dataset, filters)
+        except Exception:
+            db.pool.release(conn)
+            raise
     except Exception as e:
-        flash(f"Error exporting events: {str(e)}", 'error')
+        flash(f"Error exporting {dataset}: {str(e)}", 'error')
         return redirect('/')
 
+    batches = export_engine.Batches(cur, EXPORT_BATCH_SIZE, on_close=lambda: db.pool.release(conn))
+    extension = 'csv' if fmt == 'csv' else 'ndjson'
+    return Response(
+        export_engine.encode(fmt, columns, header, batches),
+        mimetype=export_engine.FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment;filename={dataset}.{extension}"}
+    )
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Per-namespace hit/miss/invalidation counters for this process."""
+    return jsonify(dict(event_cache.stats(), fragments=fragment_cache.stats()))
+
+@app.route('/db/stats')
+def db_stats():
+    """Connection pool usage for this process."""
+    return jsonify(db.pool.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Route, query and template timings plus pool/cache stats, in Prometheus text format."""
+    lines = []
+    for key, value in sorted(db.pool.stats().items()):
+        lines += metrics.family(f'ems_db_pool_{key}', "Connection pool statistic.", [([], value)])
+    for key, value in sorted(authenticator.stats().items()):
+        lines += metrics.family(f'ems_auth_{key}', "Login/password hashing statistic.", [([], value)])
+    cache_stats = dict(event_cache.stats(), fragments=fragment_cache.stats(),
+                       **(authenticator.cache.stats() if authenticator.cache else {}))
+    for counter in ('hits', 'misses', 'invalidations'):
+        lines += metrics.family(
+            f'ems_cache_{counter}_total', f"Event cache {counter} by namespace.",
+            [([('namespace', namespace)], counts.get(counter, 0)) for namespace, counts in sorted(cache_stats.items())],
+            'counter'
+        )
+    lines += metrics.family(
+        'ems_ratelimit_limited_total', "Requests rejected by a rate limit.",
+        [([('limit', name)], count) for name, count in sorted(rate_limiter.stats().items())],
+        'counter'
+    )
+    admission_stats = admission.stats()
+    lines += metrics.family('ems_admission_rejected_total', "Requests rejected by the concurrency cap.",
+                            [([], admission_stats.pop('rejected'))], 'counter')
+    for key, value in sorted(admission_stats.items()):
+        lines += metrics.family(f'ems_admission_{key}', "Concurrency cap statistic.", [([], value)])
+    return Response(metrics.render(lines), mimetype='text/plain; version=0.0.4')
+
+@app.route('/registration_status/<ticket>')
+def registration_status(ticket):
+    """State of a queued registration (see REGISTRATION_QUEUE)."""
+    if not registration_queue:
+        return jsonify({'error': 'Registration queue is not enabled'}), 404
+    status = registration_queue.status(ticket)
+    if status is None:
+        return jsonify({'error': 'Unknown ticket'}), 404
+    return jsonify(status)
+
+@app.route('/registration_queue/stats')
+def registration_queue_stats():
+    """Ticket counts per state in the registration queue."""
+    if not registration_queue:
+        return jsonify({'enabled': False})
+    return jsonify(dict(registration_queue.stats(), enabled=True))
+
+# JSON API (v1). Requests need "Authorization: Bearer <token>" with a token
+# from API_TOKENS (comma-separated); the API is off while none is set.
+API_TOKENS = [token.strip() for token in os.getenv('API_TOKENS', '').split(',') if token.strip()]
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+@api_v1.before_request
+def check_api_token():
+    if not API_TOKENS:
+        raise api.ApiError("The API is disabled; set API_TOKENS to enable it", 503)
+    header = request.headers.get('Authorization', '')
+    token = header[7:] if header.startswith('Bearer ') else ''
+    if not any(hmac.compare_digest(token, allowed) for allowed in API_TOKENS):
+        raise api.ApiError("Missing or invalid API token", 401)
+    return None
+
+@api_v1.errorhandler(api.ApiError)
+def api_error(e):
+    return jsonify(e.to_dict()), e.status
+
+@api_v1.errorhandler(HTTPException)
+def api_http_error(e):
+    response = jsonify(error=e.description)
+    response.status_code = e.code
+    if getattr(e, 'valid_methods', None):
+        response.headers['Allow'] = ', '.join(e.valid_methods)
+    return response
+
+# Unknown paths and methods fail in routing, before any blueprint is picked,
+# so api_v1's handlers never see them: answer those under the prefix here
+@app.errorhandler(404)
+@app.errorhandler(405)
+def routing_error(e):
+    if request.path == api_v1.url_prefix or request.path.startswith(api_v1.url_prefix + '/'):
+        return api_http_error(e)
+    return e
+
+@api_v1.errorhandler(Exception)
+def api_unexpected_error(e):
+    app.logger.exception("API request failed")
+    return jsonify(error=f"Internal error: {str(e)}"), 500
+
+def api_page_size():
+    try:
+        return max(1, min(int(request.args.get('limit', EVENTS_PAGE_SIZE)), MAX_EVENTS_PAGE_SIZE))
+    except ValueError:
+        raise api.ApiError("limit must be an integer")
+
+def api_event(event_id):
+    event = get_event(event_id)
+    if not event:
+        raise api.ApiError("Event not found", 404)
+    return event
+
+@api_v1.route('/events', methods=['GET'])
+def api_list_events():
+    """One page of events with seat counts; follow `next` for the following page."""
+    filters, errors = parse_event_filters(request.args)
+    if errors:
+        raise api.ApiError(errors[0])
+    token = request.args.get('after')
+    after = decode_event_cursor(token)
+    if token and not after:
+        raise api.ApiError("Invalid cursor")
+    events, next_cursor = get_events_page(filters, after, api_page_size())
+    counts = get_registration_counts([event[0] for event in events])
+    return jsonify(events=[api.event_dict(event, counts) for event in events], next=next_cursor)
+
+@api_v1.route('/events', methods=['POST'])
+def api_create_events():
+    """Create one event, or a batch ({"events": [...]}) in one transaction."""
+    items, is_batch = api.batch_items(api.json_body(request), 'events')
+    values = api.validate_all(items, lambda item: api.event_values(item, validate_event_input))
+    with db.transaction() as cur:
+        ids = api.create_events(cur, values)
+    invalidate_event_cache()
+    if is_batch:
+        return jsonify(ids=ids), 201
+    return jsonify(api.event_dict(api_event(ids[0]), {})), 201
+
+@api_v1.route('/events', methods=['DELETE'])
+def api_delete_events():
+    """Delete a batch of events ({"ids": [...]}) in one transaction; all must exist."""
+    ids = api.id_list(api.json_body(request))
+    with db.transaction() as cur:
+        api.delete_events(cur, ids)
+    for event_id in ids:
+        invalidate_event_cache(event_id)
+    return jsonify(deleted=ids)
+
+@api_v1.route('/events/<int:event_id>', methods=['GET'])
+def api_get_event(event_id):
+    event = api_event(event_id)
+    return jsonify(api.event_dict(event, get_registration_counts([event_id])))
+
+@api_v1.route('/events/<int:event_id>', methods=['PATCH', 'PUT'])
+def api_update_event(event_id):
+    """Update an event (PATCH: only the fields given); frees seats move the waitlist up."""
+    data = api.json_body(request)
+    if not isinstance(data, dict):
+        raise api.ApiError("Expected a JSON object")
+    with db.transaction() as cur:
+        row = db.storage.events.get(cur, event_id, for_update=True)
+        if not row:
+            raise api.ApiError("Event not found", 404)
+        current = api.event_dict(row) if request.method == 'PATCH' else None
+        if current:
+            del current['id']
+        name, date, time, location, capacity = api.validate_all(
+            [data], lambda item: api.event_values(item, validate_event_input, current))[0]
+        db.storage.events.update(cur, event_id, name=name, date=date, time=time,
+                                 location=location, capacity=capacity)
+        promoted = registration_service.promote_waitlist(cur, event_id)
+    invalidate_event_cache(event_id)
+    event = api.event_dict(api_event(event_id), get_registration_counts([event_id]))
+    return jsonify(dict(event, promoted=promoted))
+
+@api_v1.route('/events/<int:event_id>', methods=['DELETE'])
+def api_delete_event(event_id):
+    with db.transaction() as cur:
+        api.delete_events(cur, [event_id])
+    invalidate_event_cache(event_id)
+    return '', 204
+
+@api_v1.route('/events/<int:event_id>/registrations', methods=['GET'])
+def api_list_registrations(event_id):
+    """One page of an event's registrations by id; `next` is the id to pass as ?after=."""
+    api_event(event_id)
+    try:
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        raise api.ApiError("after must be an integer")
+    limit = api_page_size()
+    with db.cursor() as cur:
+        rows = db.storage.registrations.page_for_event(cur, event_id, after, limit + 1)
+    next_after = rows[limit - 1][0] if len(rows) > limit else None
+    return jsonify(registrations=[api.registration_dict(row) for row in rows[:limit]], next=next_after)
+
+@api_v1.route('/registrations', methods=['POST'])
+def api_create_registrations():
+    """Register one attendee, or a batch ({"registrations": [...]}) in one transaction.
+
+    Each result carries its status: registered, waitlisted, duplicate or not_found.
+    """
+    items, is_batch = api.batch_items(api.json_body(request), 'registrations')
+    attendees = api.validate_all(items, lambda item: api.registration_values(item, validate_registration_input))
+    with db.transaction() as cur:
+        statuses = registration_service.register_batch(cur, attendees)
+    for status in set(statuses):
+        record_registration(status)
+    results = [{'event_id': event_id, 'email': email, 'status': status}
+               for (event_id, _, email), status in zip(attendees, statuses)]
+    if is_batch:
+        return jsonify(results=results), 201
+    return jsonify(results[0]), 201
+
+@api_v1.route('/analytics')
+def api_analytics():
+    """Sign-up report from the rollups; ?days=N (default 30) and ?event_id= narrow it."""
+    days, event_id = get_analytics_window(request.args)
+    with db.cursor() as cur:
+        return jsonify(analytics.report(cur, days, event_id))
+
+app.register_blueprint(api_v1)
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""Login fast path: narrow user lookups, a user cache and bounded password hashing.
+
+* Users are looked up by email with only the columns login needs, and kept
+  for AUTH_CACHE_TTL seconds in an in-process cache (password hashes are
+  never put in the shared CACHE_URL backend). Entries are keyed on the
+  account's credentials version, a counter that every password change
+  bumps. Kept in the shared backend, it makes every worker reload the user
+  at once, so an old password stops working everywhere immediately. Without
+  a shared backend the version is per process, so the app leaves the cache
+  off unless AUTH_CACHE_TTL is set (safe with a single worker).
+* Hashes use PASSWORD_HASH_METHOD (any werkzeug method string, e.g.
+  "scrypt" or "pbkdf2:sha256:600000"). A user whose stored hash was made
+  with different parameters is rehashed transparently on their next login.
+* At most AUTH_MAX_CONCURRENT_HASHES hashes are computed at once per
+  process. A login that cannot get a slot within AUTH_HASH_WAIT seconds
+  raises HashingBusy, so a login storm is turned away with a 503 instead of
+  starving every other route of CPU.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import db
+from cache import Cache, MemoryBackend
+
+DEFAULT_HASH_METHOD = 'scrypt'
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(Exception):
+    """No password-hashing slot became free within the wait timeout."""
+
+
+class Authenticator:
+    """User lookups and password checks for login and password reset."""
+
+    def __init__(self, hash_method=None, max_concurrent=None, wait_timeout=2.0, cache_ttl=30, versions=None):
+        self.hash_method = hash_method or DEFAULT_HASH_METHOD
+        self.max_concurrent = max_concurrent or os.cpu_count() or 2
+        self.wait_timeout = wait_timeout
+        # cache_ttl 0 turns the user cache off
+        self.cache = Cache(MemoryBackend(), cache_ttl) if cache_ttl else None
+        # Credentials versions: pass a shared cache backend so all workers see them
+        self.versions = versions or MemoryBackend()
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._method_prefix = None
+        self._lock = threading.Lock()
+        self._stats = {'hash_busy_rejections': 0, 'rehashed': 0, 'hashing': 0}
+
+    def _count(self, field, delta=1):
+        with self._lock:
+            self._stats[field] += delta
+
+    @contextmanager
+    def _hash_slot(self):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            self._count('hash_busy_rejections')
+            raise HashingBusy("Too many password checks in progress")
+        self._count('hashing')
+        try:
+            yield
+        finally:
+            self._count('hashing', -1)
+            self._slots.release()
+
+    @property
+    def method_prefix(self):
+        # Expanded parameters of the configured method, e.g. "scrypt:32768:8:1"
+        if self._method_prefix is None:
+            self._method_prefix = generate_password_hash('', method=self.hash_method).split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.method_prefix
+
+    def credentials_version(self, email):
+        return self.versions.get(f"credentials:{(email or '').lower()}") or 0
+
+    def find_user(self, email):
+        """The user's id, name, email and password hash, or None."""
+        def load():
+            with db.cursor() as cur:
+                return db.storage.users.find_for_login(cur, email)
+        if self.cache is None:
+            return load()
+        # Read the version first: an entry loaded before a password change
+        # is filed under the old version and never read again
+        key = f"{(email or '').lower()}:{self.credentials_version(email)}"
+        return self.cache.get_or_set('users', key, load)
+
+    def forget(self, email):
+        """Call after a password change commits: every cached copy of the user goes stale."""
+        self.versions.incr(f"credentials:{(email or '').lower()}")
+
+    def hash_password(self, password):
+        with self._hash_slot():
+            return generate_password_hash(password, method=self.hash_method)
+
+    def authenticate(self, email, password):
+        """Return the user for valid credentials, else None.
+
+        Raises HashingBusy when no hashing slot frees up in time.
+        """
+        user = self.find_user(email)
+        if not user:
+            return None
+        new_hash = None
+        with self._hash_slot():
+            if not check_password_hash(user['password'], password):
+                return None
+            if self.needs_rehash(user['password']):
+                new_hash = generate_password_hash(password, method=self.hash_method)
+
+        if new_hash:
+            try:
+                with db.transaction() as cur:
+                    db.storage.users.set_password(cur, user['id'], new_hash)
+                self.forget(email)
+                self._count('rehashed')
+            except Exception:
+                # The old hash still works; try again on the next login
+                logger.exception("Could not rehash password for user %s", user['id'])
+        return user
+
+    def set_password(self, email, password):
+        password_hash = self.hash_password(password)
+        with db.transaction() as cur:
+            db.storage.users.set_password_by_email(cur, email, password_hash)
+        self.forget(email)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['max_concurrent_hashes'] = self.max_concurrent
+        return stats
@@ -0,0 +1,249 @@
+"""Reproducible route benchmarks against a local database.
+
+Seeds a scratch database with populate_sample_data.generate (this REPLACES
+its contents, so --database must name a throwaway database: MYSQL_DB, or
+SQLITE_PATH with DB_BACKEND=sqlite), serves
+the app in-process on a threaded WSGI server (or targets --url), and drives
+each scenario with the loadtest.py client:
+
+    python benchmark.py --database ems_bench --users 2000 --events 200 \\
+        --registrations 20000 --requests 1000 --concurrency 50
+    python benchmark.py --database ems_bench --no-seed --compare benchmark_results/<earlier>.json
+    DB_BACKEND=sqlite python benchmark.py --database /tmp/ems_bench.db
+
+Each scenario reports throughput, p50/p95/p99 latency, status codes and the
+average number of database queries per request (read from /metrics). Results
+are written to benchmark_results/<time>-<commit>.json; --compare prints the
+change against an earlier result file.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode, urlsplit
+
+from dotenv import load_dotenv
+
+import loadtest
+
+ADMIN_EMAIL = 'admin@admin.com'
+ADMIN_PASSWORD = 'admin123'
+FORM = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+# scenario -> URL rule it exercises, as labelled in /metrics
+SCENARIOS = {
+    'login': '/',
+    'dashboard': '/dashboard',
+    'admin': '/admin',
+    'register_event': '/register_event/<int:event_id>',
+    'view_registration': '/view_registration/<int:event_id>',
+    'export': '/export',
+}
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if dirty else commit
+
+
+def start_server(port):
+    """Serve app.py on a background thread; returns the base URL."""
+    from werkzeug.serving import make_server
+
+    # Measure the routes, not the admission limits or background jobs
+    os.environ.setdefault('RATE_LIMITS', 'off')
+    os.environ.setdefault('MAX_CONCURRENT_REQUESTS', '0')
+    os.environ.setdefault('ANALYTICS_COMPACT_INTERVAL', '0')
+    from app import app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def event_ids():
+    from populate_sample_data import connect, storage
+
+    db = connect()
+    try:
+        return storage().events.ids(db.cursor())
+    finally:
+        db.close()
+
+
+async def fetch_text(base_url, path):
+    parts = urlsplit(base_url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    writer.write(f"GET {path} HTTP/1.0\r\nHost: {parts.hostname}\r\n\r\n".encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data.split(b'\r\n\r\n', 1)[-1].decode()
+
+
+async def query_totals(base_url):
+    """{route: (db queries sum, request count)} from /metrics."""
+    text = await fetch_text(base_url, '/metrics')
+    totals = {}
+    for kind, endpoint, value in re.findall(
+            r'^ems_http_request_db_queries_(sum|count)\{endpoint="([^"]*)"\} (\S+)$', text, re.M):
+        queries, count = totals.get(endpoint, (0.0, 0.0))
+        totals[endpoint] = (queries + float(value), count) if kind == 'sum' else (queries, count + float(value))
+    return totals
+
+
+def build_requests(name, count, user_cookies, admin_cookie, ids, rng, password):
+    requests = []
+    for k in range(count):
+        cookie = user_cookies[k % len(user_cookies)]
+        if name == 'login':
+            email = f"user{k % len(user_cookies) + 1}@example.com"
+            body = urlencode({'email': email, 'password': password}).encode()
+            requests.append(('POST', '/', FORM, body))
+        elif name == 'dashboard':
+            requests.append(('GET', '/dashboard', {'Cookie': cookie}, b''))
+        elif name == 'admin':
+            requests.append(('GET', '/admin', {'Cookie': admin_cookie}, b''))
+        elif name == 'register_event':
+            # Walks (user, event) pairs so each request is a new registration
+            event_id = ids[(k // len(user_cookies)) % len(ids)]
+            requests.append(('POST', f'/register_event/{event_id}', dict(FORM, Cookie=cookie), b''))
+        elif name == 'view_registration':
+            requests.append(('GET', f'/view_registration/{rng.choice(ids)}', {'Cookie': admin_cookie}, b''))
+        elif name == 'export':
+            requests.append(('GET', '/export', {'Cookie': admin_cookie}, b''))
+    return requests
+
+
+async def run_scenarios(base_url, names, requests_per_scenario, concurrency, users, seed, warmup, password):
+    ids = event_ids()
+    if not ids:
+        raise SystemExit("No events in the database; seed it first")
+    rng = random.Random(seed)
+
+    emails = [f"user{i}@example.com" for i in range(1, users + 1)]
+    cookies = await loadtest.login_users(base_url, emails, password, min(concurrency, 50))
+    user_cookies = [cookies[email] for email in emails if email in cookies]
+    admin = await loadtest.login_users(base_url, [ADMIN_EMAIL], ADMIN_PASSWORD, 1)
+    if not user_cookies or not admin:
+        raise SystemExit("Could not log in the generated users and the admin")
+    admin_cookie = admin[ADMIN_EMAIL]
+
+    results = {}
+    for name in names:
+        endpoint = SCENARIOS[name]
+        requests = build_requests(name, requests_per_scenario + warmup, user_cookies, admin_cookie,
+                                  ids, rng, password)
+        if warmup:
+            await loadtest.run_requests(base_url, requests[:warmup], concurrency)
+        before = await query_totals(base_url)
+        latencies, statuses, elapsed = await loadtest.run_requests(base_url, requests[warmup:], concurrency)
+        after = await query_totals(base_url)
+
+        result = loadtest.summarize(latencies, statuses, elapsed)
+        queries = after.get(endpoint, (0, 0))[0] - before.get(endpoint, (0, 0))[0]
+        counted = after.get(endpoint, (0, 0))[1] - before.get(endpoint, (0, 0))[1]
+        result['db_queries_per_request'] = round(queries / counted, 2) if counted else None
+        results[name] = result
+        print(f"{name:18} {result['throughput_rps']:>9} req/s  p50 {result['p50_ms']:>8} ms  "
+              f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+              f"queries/req {result['db_queries_per_request']}")
+    return results
+
+
+def compare(baseline, current):
+    """Print throughput and p95 changes per scenario against a baseline result."""
+    print(f"\nCompared with {baseline['commit']} ({baseline['started_at']}):")
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        for key in ('throughput_rps', 'p95_ms', 'db_queries_per_request'):
+            old, new = before.get(key), result.get(key)
+            if old and new is not None:
+                print(f"  {name:18} {key:24} {old:>10} -> {new:<10} ({(new - old) / old * 100:+.1f}%)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Flask routes against a local database.")
+    parser.add_argument('--database', help="scratch database to seed and use: overrides MYSQL_DB, "
+                                           "or SQLITE_PATH with DB_BACKEND=sqlite")
+    parser.add_argument('--no-seed', action='store_true', help="reuse the data already in the database")
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--registrations', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--url', help="benchmark a running server instead of starting one")
+    parser.add_argument('--port', type=int, default=0, help="port for the in-process server (default: any)")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="scenario to run; repeatable (default: all)")
+    parser.add_argument('--requests', type=int, default=500, help="measured requests per scenario")
+    parser.add_argument('--warmup', type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--output', default='benchmark_results', help="directory for JSON results")
+    parser.add_argument('--compare', help="earlier result file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Read .env first, so DB_BACKEND set there decides which setting --database replaces
+    load_dotenv()
+    if args.database:
+        sqlite = (os.getenv('DB_BACKEND') or 'mysql').lower() == 'sqlite'
+        os.environ['SQLITE_PATH' if sqlite else 'MYSQL_DB'] = args.database
+    elif not args.no_seed:
+        raise SystemExit("Seeding replaces all data: pass --database <scratch db>, or --no-seed")
+
+    import populate_sample_data
+
+    seeded = None
+    if not args.no_seed:
+        print(f"Seeding {populate_sample_data.storage().target} ...")
+        seeded = populate_sample_data.generate(args.users, args.events, args.registrations, args.seed)
+
+    base_url = args.url or start_server(args.port)
+    names = args.scenario or list(SCENARIOS)
+    started_at = datetime.now().isoformat(timespec='seconds')
+    scenarios = asyncio.run(run_scenarios(
+        base_url, names, args.requests, args.concurrency, args.users, args.seed, args.warmup,
+        populate_sample_data.SHARED_PASSWORD))
+
+    result = {
+        'commit': git_revision(),
+        'started_at': started_at,
+        'target': args.url or 'in-process',
+        'dataset': seeded or {'reused': True},
+        'parameters': {key: getattr(args, key) for key in
+                       ('users', 'events', 'registrations', 'seed', 'requests', 'warmup', 'concurrency')},
+        'scenarios': scenarios,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{time.strftime('%Y%m%d-%H%M%S')}-{result['commit']}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Read-through cache for event data.
+
+Events change rarely (only through the add/update/delete routes), so the
+listing pages and per-event lookups are served from a cache and the write
+routes invalidate it explicitly.
+
+Entries live in a pluggable backend: an in-process MemoryBackend by default,
+or a shared RedisBackend when CACHE_URL points at a redis:// server so that
+several workers see the same entries and invalidations. MemoryBackend
+implements the same interface and stands in for the shared backend locally.
+"""
+import pickle
+import threading
+import time
+
+
+class MemoryBackend:
+    """In-process backend with per-entry expiry."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = (self._data.get(key, (0, None))[0] or 0) + 1
+            self._data[key] = (value, None)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """Shared backend storing pickled values in Redis (requires the `redis` package)."""
+
+    def __init__(self, url, prefix='ems:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        # incr() counters are stored as plain integers, not pickles
+        return int(raw) if raw.isdigit() else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self._prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def incr(self, key):
+        return self._client.incr(self._prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+
+class Cache:
+    """Read-through cache with TTL, namespace invalidation and hit/miss counters.
+
+    Keys are grouped in namespaces; invalidate() bumps the namespace generation
+    so every key in it is orphaned at once (old entries simply expire).
+    """
+
+    def __init__(self, backend, default_ttl=60):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._key_locks = {}
+        self._key_locks_lock = threading.Lock()
+
+    def _count(self, namespace, field):
+        with self._stats_lock:
+            counters = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'invalidations': 0})
+            counters[field] += 1
+
+    def _generation(self, namespace):
+        return self.backend.get(f"{namespace}:generation") or 0
+
+    def _key_lock(self, key):
+        with self._key_locks_lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_or_set(self, namespace, key, loader, ttl=None):
+        """Return the cached value for key, calling loader() to fill it on a miss."""
+        full_key = f"{namespace}:{self._generation(namespace)}:{key}"
+        value = self.backend.get(full_key)
+        if value is not None:
+            self._count(namespace, 'hits')
+            return value
+
+        # Only one thread per process reloads a given key; the others wait for it
+        with self._key_lock(full_key):
+            value = self.backend.get(full_key)
+            if value is not None:
+                self._count(namespace, 'hits')
+                return value
+            self._count(namespace, 'misses')
+            value = loader()
+            if value is not None:
+                self.backend.set(full_key, value, ttl or self.default_ttl)
+        with self._key_locks_lock:
+            self._key_locks.pop(full_key, None)
+        return value
+
+    def forget(self, namespace, key):
+        """Drop a single entry."""
+        self.backend.delete(f"{namespace}:{self._generation(namespace)}:{key}")
+        self._count(namespace, 'invalidations')
+
+    def invalidate(self, namespace):
+        """Drop every entry in a namespace."""
+        self.backend.incr(f"{namespace}:generation")
+        self._count(namespace, 'invalidations')
+
+    def stats(self):
+        with self._stats_lock:
+            return {namespace: dict(counters) for namespace, counters in self._stats.items()}
+
+
+def create_cache(url=None, default_ttl=60):
+    """Build a Cache from a CACHE_URL value ('memory://' or 'redis://...')."""
+    if url and url.startswith(('redis://', 'rediss://')):
+        return Cache(RedisBackend(url), default_ttl)
+    return Cache(MemoryBackend(), default_ttl)
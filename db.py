@@ -1,16 +1,271 @@
-from flask import Flask
-from flask_mysqldb import MySQL
-from dotenv import load_dotenv
+"""Shared data access: a bounded connection pool and per-request connections.
+
+Every request checks out at most one pooled connection, on first use, and
+returns it when the app context tears down, so early returns and exceptions
+can no longer leak connections or cursors. Connections are health-checked
+(ping) after sitting idle and recycled after DB_POOL_RECYCLE seconds. Every
+statement run through a pooled connection is timed (see metrics.py).
+
+The connections come from the DB_BACKEND storage backend (MySQL or an
+embedded SQLite file), and the SQL lives in its repositories (storage.py):
+
+    import db
+    db.init_app(app)
+
+    with db.cursor() as cur:            # read
+        event = db.storage.events.get(cur, event_id)
+    with db.transaction() as cur:       # write; commits, or rolls back on error
+        db.storage.events.delete(cur, [event_id])
+"""
 import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g
+
+import metrics
+from storage import create as create_storage
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool timeout."""
+
+
+class TimedCursor:
+    """Cursor wrapper that reports every execute/executemany to metrics."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            metrics.observe_query(query, args, time.perf_counter() - started)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            metrics.observe_query(query, args[0] if args else None,
+                                  time.perf_counter() - started, len(args))
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedConnection:
+    """Connection wrapper whose cursors are TimedCursors."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, cursorclass=None):
+        raw = self._connection.cursor(cursorclass) if cursorclass else self._connection.cursor()
+        return TimedCursor(raw)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class ConnectionPool:
+    """Thread-safe pool of at most `size` connections made by `connect()`.
+
+    `errors` is the driver's exception class, caught when closing or
+    checking a connection.
+    """
+
+    def __init__(self, connect, errors=Exception, size=10, timeout=5.0, recycle=3600, ping_interval=30):
+        self.connect = connect
+        self.errors = errors
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Called again after a fork: the parent's sockets must not be shared
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = []  # (connection, created_at, last_used), most recent last
+        self._created = {}
+        self._stats = {
+            'connections_created': 0, 'connections_recycled': 0, 'connections_failed_check': 0,
+            'checkouts': 0, 'timeouts': 0, 'in_use': 0, 'wait_seconds_total': 0.0,
+        }
+
+    def _connect(self):
+        connection = TimedConnection(self.connect())
+        with self._lock:
+            self._created[id(connection)] = time.monotonic()
+            self._stats['connections_created'] += 1
+        return connection
+
+    def _close(self, connection):
+        # Callers hold self._lock
+        self._created.pop(id(connection), None)
+        try:
+            connection.close()
+        except self.errors:
+            pass
+
+    def acquire(self):
+        """Check out a connection, waiting up to `timeout` seconds for a free slot."""
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._reset()
+
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+
+        try:
+            connection = self._take_idle()
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['wait_seconds_total'] += time.monotonic() - started
+        return connection
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, created_at, last_used = self._idle.pop()
+            now = time.monotonic()
+            if now - created_at > self.recycle:
+                with self._lock:
+                    self._close(connection)
+                    self._stats['connections_recycled'] += 1
+                continue
+            if now - last_used > self.ping_interval:
+                try:
+                    connection.ping()
+                except self.errors:
+                    with self._lock:
+                        self._close(connection)
+                        self._stats['connections_failed_check'] += 1
+                    continue
+            return connection
+
+    def release(self, connection, discard=False):
+        """Return a connection; any open transaction is rolled back first."""
+        if not discard:
+            try:
+                connection.rollback()
+            except self.errors:
+                discard = True
+        with self._lock:
+            self._stats['in_use'] -= 1
+            if discard:
+                self._close(connection)
+            else:
+                created_at = self._created.get(id(connection), time.monotonic())
+                self._idle.append((connection, created_at, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Context-managed checkout for code running outside a request."""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        stats['size'] = self.size
+        stats['wait_seconds_total'] = round(stats['wait_seconds_total'], 6)
+        return stats
+
+    def close_all(self):
+        with self._lock:
+            for connection, _, _ in self._idle:
+                self._close(connection)
+            self._idle = []
+
+
+pool = None
+storage = None
+
+
+def init_app(app):
+    """Create the storage backend and pool from the DB_BACKEND, MYSQL_*, SQLITE_* and DB_POOL_* config."""
+    global pool, storage
+    storage = create_storage(app.config)
+    storage.prepare()
+    pool = ConnectionPool(
+        storage.connect,
+        errors=storage.Error,
+        size=app.config.get('DB_POOL_SIZE', 10),
+        timeout=app.config.get('DB_POOL_TIMEOUT', 5.0),
+        recycle=app.config.get('DB_POOL_RECYCLE', 3600),
+        ping_interval=app.config.get('DB_POOL_PING_INTERVAL', 30),
+    )
+    app.extensions['db_pool'] = pool
+    app.extensions['db_storage'] = storage
+    app.teardown_appcontext(_release_request_connection)
+    return pool
+
+
+def get_connection():
+    """The current request's connection, checked out from the pool on first use."""
+    if 'db_connection' not in g:
+        g.db_connection = pool.acquire()
+    return g.db_connection
+
+
+def _release_request_connection(exc):
+    connection = g.pop('db_connection', None)
+    if connection is not None:
+        pool.release(connection)
 
-# Load environment variables
-load_dotenv()
 
-app = Flask(__name__)
+@contextmanager
+def cursor(cursorclass=None):
+    """A cursor on the request connection that is always closed."""
+    cur = get_connection().cursor(cursorclass) if cursorclass else get_connection().cursor()
+    try:
+        yield cur
+    finally:
+        cur.close()
 
-app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST')
-app.config['MYSQL_USER'] = os.getenv('MYSQL_USER')
-app.config['MYSQL_PASSWORD'] = os.getenv('MYSQL_PASSWORD')
-app.config['MYSQL_DB'] = os.getenv('MYSQL_DB')
 
-mysql = MySQL(app)
\ No newline at end of file
+@contextmanager
+def transaction(cursorclass=None):
+    """Like cursor(), but commits on success and rolls back on error."""
+    connection = get_connection()
+    with cursor(cursorclass) as cur:
+        try:
+            yield cur
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
@@ -0,0 +1,128 @@
+"""Streaming CSV / NDJSON exports.
+
+Rows are read through a server-side (unbuffered) cursor in fixed-size
+batches and encoded batch by batch, so an export holds at most one batch in
+memory no matter how large the table is, and the first bytes go out as soon
+as the first batch has been read.
+"""
+import csv
+import io
+import json
+
+import db
+
+EXPORT_BATCH_SIZE = 1000
+
+# dataset (a db.storage repository, whose export() runs the query) -> (column names, CSV header)
+EXPORTS = {
+    'events': (
+        ['id', 'name', 'date', 'time', 'location', 'capacity'],
+        ['ID', 'Name', 'Date', 'Time', 'Location', 'Capacity'],
+    ),
+    'registrations': (
+        ['id', 'event_id', 'user_id', 'name', 'email', 'status'],
+        ['ID', 'Event ID', 'User ID', 'Name', 'Email', 'Status'],
+    ),
+    # The roster; never includes password hashes
+    'users': (
+        ['id', 'registration_number', 'name', 'email', 'semester', 'year'],
+        ['ID', 'Registration Number', 'Name', 'Email', 'Semester', 'Year'],
+    ),
+}
+
+# Datasets that can be filtered with ?column=value (see UserRepository.FILTERS)
+FILTERED = ('users',)
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def open_export(connection, dataset, filters=None):
+    """Start the `dataset` export on a streaming cursor; rows are fetched lazily through Batches.
+
+    Filters apply to the FILTERED datasets only; unknown columns are ignored.
+    """
+    cursor = db.storage.streaming_cursor(connection)
+    repository = getattr(db.storage, dataset)
+    try:
+        if dataset in FILTERED:
+            repository.export(cursor, filters or {})
+        else:
+            repository.export(cursor)
+    except Exception:
+        cursor.close()
+        raise
+    return cursor
+
+
+class Batches:
+    """Iterate a cursor in lists of at most batch_size rows.
+
+    close() releases the cursor (and calls on_close) exactly once, whether
+    the export finished, failed or was abandoned before the first batch.
+    """
+
+    def __init__(self, cursor, batch_size=EXPORT_BATCH_SIZE, on_close=None):
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self.on_close = on_close
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        rows = self.cursor.fetchmany(self.batch_size)
+        if not rows:
+            self.close()
+            raise StopIteration
+        return rows
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.cursor.close()
+        finally:
+            if self.on_close:
+                self.on_close()
+
+
+def csv_chunks(header, batches):
+    """Encode batches as RFC 4180 CSV (quoted where needed), one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    try:
+        yield buffer.getvalue()
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+    finally:
+        # Release the cursor even if the client disconnects mid-download
+        batches.close()
+
+
+def ndjson_chunks(columns, batches):
+    """Encode batches as newline-delimited JSON objects, one chunk per batch."""
+    try:
+        for rows in batches:
+            yield ''.join(
+                json.dumps(dict(zip(columns, row)), default=str, separators=(',', ':')) + '\n'
+                for row in rows
+            )
+    finally:
+        batches.close()
+
+
+def encode(fmt, columns, header, batches):
+    if fmt == 'ndjson':
+        return ndjson_chunks(columns, batches)
+    return csv_chunks(header, batches)
@@ -0,0 +1,65 @@
+"""Rendered-fragment cache for event cards and rows.
+
+The parts of an event card or admin table row that depend only on the event
+row (name, date, time, location, links) are macros in
+templates/_event_fragments.html. event_fragment('card_details', event)
+renders one once per process and then serves it from a dict, keyed by event
+id and checked against the row itself, so an edited event (a different row)
+is re-rendered even if another worker made the change. The write routes
+also call forget() so stale entries do not linger. Seat counts and "already
+applied" badges change per request and stay in the page template.
+"""
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+FRAGMENT_TEMPLATE = '_event_fragments.html'
+MAX_EVENTS = 5000
+
+
+class FragmentCache:
+    """LRU of rendered macros: {event_id: {macro: (event row, html)}}."""
+
+    def __init__(self, env, template_name=FRAGMENT_TEMPLATE, max_events=MAX_EVENTS):
+        self.env = env
+        self.template_name = template_name
+        self.max_events = max_events
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def render(self, macro, event):
+        event_id = event[0]
+        with self._lock:
+            fragments = self._entries.get(event_id)
+            if fragments is not None:
+                self._entries.move_to_end(event_id)
+                cached = fragments.get(macro)
+                if cached is not None and cached[0] == event:
+                    self._stats['hits'] += 1
+                    return cached[1]
+            self._stats['misses'] += 1
+
+        module = self.env.get_template(self.template_name).module
+        html = Markup(getattr(module, macro)(event))
+        with self._lock:
+            self._entries.setdefault(event_id, {})[macro] = (tuple(event), html)
+            self._entries.move_to_end(event_id)
+            while len(self._entries) > self.max_events:
+                self._entries.popitem(last=False)
+        return html
+
+    def forget(self, event_id):
+        with self._lock:
+            self._entries.pop(event_id, None)
+            self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, events=len(self._entries))
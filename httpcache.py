@@ -0,0 +1,128 @@
+"""HTTP caching: conditional GETs for the event pages, immutable static assets.
+
+Pages wrapped in @conditional get an ETag derived from the data version,
+the URL and the logged-in user, and a repeat request with a matching
+If-None-Match is answered with 304 before the view runs, so no query or
+template render happens. Last-Modified is sent too but only informs: it is
+not per user, so only the ETag can produce a 304. The data version is a
+counter in the event cache backend that every write path bumps through
+DataVersion.bump(). With a shared CACHE_URL all workers see the same
+counter; the in-process backend cannot see other workers' bumps, so there
+the version also rolls over every `window` seconds (CACHE_TTL), the same
+staleness bound as the event cache itself.
+
+static_url('style.css') returns /static/style.css?v=<content hash>; a
+request carrying the current hash is served with a one-year immutable
+Cache-Control, so browsers never revalidate it. Editing the file changes
+the hash and therefore the URL.
+"""
+import hashlib
+import os
+import time
+from functools import lru_cache, wraps
+
+from flask import current_app, make_response, request, session, url_for
+
+VERSION_KEY = 'data_version'
+MODIFIED_KEY = 'data_version:modified'
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+
+class DataVersion:
+    """Counter identifying the current state of events and registrations."""
+
+    def __init__(self, backend, shared=False, window=60):
+        self.backend = backend
+        self.shared = shared
+        self.window = window
+
+    def bump(self):
+        """Record that events or registrations changed."""
+        self.backend.incr(VERSION_KEY)
+        self.backend.set(MODIFIED_KEY, time.time())
+
+    def current(self):
+        """(token, last modified as a Unix time)."""
+        version = self.backend.get(VERSION_KEY) or 0
+        modified = self.backend.get(MODIFIED_KEY)
+        if modified is None:
+            # Also covers a flushed backend: the timestamp keeps old ETags from matching
+            modified = time.time()
+            self.backend.set(MODIFIED_KEY, modified)
+        if not self.shared:
+            window_start = time.time() // self.window * self.window
+            modified = max(modified, window_start)
+        return f"{version}-{modified:.6f}", modified
+
+
+def page_etag(token):
+    # Pages differ per user (applied badges) and per query string (filters, cursor)
+    viewer = f"{session.get('user_id', '')}|{session.get('email', '')}"
+    key = f"{token}|{viewer}|{request.full_path}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def conditional(data_version):
+    """Decorator answering repeat GETs of an unchanged page with 304."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # A pending flash message must be rendered, and consumed, by the view
+            if '_flashes' in session:
+                return view(*args, **kwargs)
+            # Read before the view runs: a write during rendering only makes the
+            # ETag older than the page, never newer
+            token, modified = data_version.current()
+            etag = page_etag(token)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or '_flashes' in session:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = modified
+            # Revalidate on every use; never stored by shared caches
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def _file_hash(path, mtime):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def fingerprint(filename):
+    """Short content hash of a file in the static folder."""
+    path = os.path.join(current_app.static_folder, filename)
+    return _file_hash(path, os.path.getmtime(path))
+
+
+def static_url(filename):
+    """URL of a static file with its content hash, for immutable caching."""
+    return url_for('static', filename=filename, v=fingerprint(filename))
+
+
+def cache_static(response):
+    """after_request hook: long-lived caching for fingerprinted static files."""
+    if request.endpoint != 'static' or response.status_code != 200:
+        return response
+    version = request.args.get('v')
+    filename = (request.view_args or {}).get('filename')
+    if version and filename:
+        try:
+            current = fingerprint(filename)
+        except OSError:
+            return response
+        if version == current:
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    return response
+
+
+def init_app(app):
+    app.add_template_global(static_url)
+    app.after_request(cache_static)
@@ -0,0 +1,213 @@
+"""Concurrent HTTP load client for the registration rush.
+
+Logs in generated users (see populate_sample_data.py; they share the
+password "password"), then has every user register for one event while
+others load the dashboard, and reports throughput and latency. Pass --url
+several times to compare servers, e.g. the sync app against rush mode:
+
+    python app.py                                   # http://127.0.0.1:5000
+    uvicorn rush:asgi_app --port 8000
+    python loadtest.py --url http://127.0.0.1:5000 --url http://127.0.0.1:8000 \\
+        --event-id 1 --users 1000 --concurrency 500
+
+The client is plain asyncio (no third-party dependencies) and keeps one
+HTTP/1.1 keep-alive connection per concurrent worker.
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlencode, urlsplit
+
+
+class HTTPConnection:
+    """Minimal keep-alive HTTP/1.1 client connection."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, headers=None, body=b''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        cookies = []
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookies.append(value)
+            response_headers[name] = value
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                body.extend(await self.reader.readexactly(size + 2))
+        elif 'content-length' in response_headers:
+            await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            await self.reader.read()
+            await self.close()
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, response_headers, cookies
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed):
+    """Throughput and latency percentiles (milliseconds) for one run."""
+    ordered = sorted(latencies)
+    counts = {}
+    for status in statuses:
+        counts[str(status)] = counts.get(str(status), 0) + 1
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'max_ms': round((ordered[-1] if ordered else 0) * 1000, 2),
+        'statuses': counts,
+    }
+
+
+async def run_requests(base_url, requests, concurrency):
+    """Send (method, path, headers, body) requests with `concurrency` workers.
+
+    Returns (latencies, statuses, elapsed seconds).
+    """
+    parts = urlsplit(base_url)
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+    latencies, statuses = [], []
+
+    async def worker():
+        connection = HTTPConnection(parts.hostname, parts.port or 80)
+        try:
+            while True:
+                try:
+                    method, path, headers, body = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    status, _, _ = await connection.request(method, path, headers, body)
+                except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    status = 'error'
+                    await connection.close()
+                latencies.append(time.perf_counter() - started)
+                statuses.append(status)
+        finally:
+            await connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(requests))))))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def login_users(base_url, emails, password, concurrency):
+    """Log users in and return {email: Cookie header value}."""
+    parts = urlsplit(base_url)
+    queue = asyncio.Queue()
+    for email in emails:
+        queue.put_nowait(email)
+    cookies = {}
+
+    async def worker():
+        connection = HTTPConnection(parts.hostname, parts.port or 80)
+        try:
+            while not queue.empty():
+                email = queue.get_nowait()
+                body = urlencode({'email': email, 'password': password}).encode()
+                _, _, set_cookies = await connection.request(
+                    'POST', '/', {'Content-Type': 'application/x-www-form-urlencoded'}, body)
+                session = [cookie.split(';', 1)[0] for cookie in set_cookies if cookie.startswith('session=')]
+                if session:
+                    cookies[email] = session[0]
+        finally:
+            await connection.close()
+
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(emails))))))
+    return cookies
+
+
+async def rush(base_url, event_id, users, concurrency, dashboard_ratio, password, first_user=1):
+    emails = [f"user{i}@example.com" for i in range(first_user, first_user + users)]
+    cookies = await login_users(base_url, emails, password, min(concurrency, 50))
+    if not cookies:
+        raise SystemExit(f"Could not log in any users against {base_url}")
+
+    requests = []
+    for n, cookie in enumerate(cookies.values()):
+        headers = {'Cookie': cookie, 'Content-Type': 'application/x-www-form-urlencoded'}
+        requests.append(('POST', f'/register_event/{event_id}', headers, b''))
+        if dashboard_ratio and n % dashboard_ratio == 0:
+            requests.append(('GET', '/dashboard', {'Cookie': cookie}, b''))
+
+    latencies, statuses, elapsed = await run_requests(base_url, requests, concurrency)
+    result = summarize(latencies, statuses, elapsed)
+    result['logged_in_users'] = len(cookies)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Registration rush load test.")
+    parser.add_argument('--url', action='append', required=True,
+                        help="server base URL; repeat to compare several servers")
+    parser.add_argument('--event-id', type=int, required=True)
+    parser.add_argument('--users', type=int, default=500, help="distinct users registering")
+    parser.add_argument('--first-user', type=int, default=1,
+                        help="index of the first generated user (use disjoint ranges per server)")
+    parser.add_argument('--concurrency', type=int, default=200, help="requests in flight")
+    parser.add_argument('--dashboard-ratio', type=int, default=1,
+                        help="one /dashboard GET per this many registrations (0 disables)")
+    parser.add_argument('--password', default='password')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    results = {}
+    for n, url in enumerate(args.url):
+        # Each server gets its own users so no run only sees duplicates
+        first_user = args.first_user + n * args.users
+        results[url] = asyncio.run(rush(url, args.event_id, args.users, args.concurrency,
+                                        args.dashboard_ratio, args.password, first_user))
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,181 @@
+"""Request, query and template timing with a Prometheus text exporter.
+
+    import metrics
+    metrics.init_app(app)           # route latency, DB round trips, template time
+    metrics.render()                # exposition text for /metrics
+
+Queries are timed by db.py's cursors (observe_query) and grouped by a short
+label such as "SELECT events". Queries slower than SLOW_QUERY_MS are logged
+to the "slow_query" logger with their SQL text; parameter values are never
+logged, only their count.
+"""
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+slow_query_logger = logging.getLogger('slow_query')
+slow_query_seconds = 0.2
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            base = list(zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{format_labels(base + [('le', format_value(bound))])} {count}")
+            lines.append(f"{self.name}_bucket{format_labels(base + [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{format_labels(base)} {format_value(series[-2])}")
+            lines.append(f"{self.name}_count{format_labels(base)} {series[-1]}")
+        return lines
+
+
+request_seconds = Histogram(
+    'ems_http_request_duration_seconds', "Time to build the response, by route.",
+    ('endpoint', 'method', 'status'))
+request_queries = Histogram(
+    'ems_http_request_db_queries', "Database round trips per request, by route.",
+    ('endpoint',), COUNT_BUCKETS)
+request_db_seconds = Histogram(
+    'ems_http_request_db_seconds', "Time spent in database calls per request, by route.",
+    ('endpoint',))
+query_seconds = Histogram(
+    'ems_db_query_duration_seconds', "Database statement time, by statement and table.",
+    ('query',))
+template_seconds = Histogram(
+    'ems_template_render_seconds', "Template render time, by template.",
+    ('template',))
+HISTOGRAMS = (request_seconds, request_queries, request_db_seconds, query_seconds, template_seconds)
+
+_slow_queries = 0
+_slow_lock = threading.Lock()
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+@lru_cache(maxsize=1024)
+def query_label(sql):
+    """Low-cardinality label for a statement, e.g. "SELECT events"."""
+    words = sql.split(None, 1)
+    verb = words[0].upper() if words else ''
+    match = re.search(r'\b(?:FROM|INTO|UPDATE)\s+`?(\w+)', sql, re.IGNORECASE)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+def observe_query(sql, params, seconds, rows=1):
+    """Record one database call (called by db.py's cursors)."""
+    query_seconds.observe(seconds, query_label(sql))
+    if has_request_context() and 'metrics_started' in g:
+        g.metrics_queries += 1
+        g.metrics_db_seconds += seconds
+    if seconds >= slow_query_seconds:
+        global _slow_queries
+        with _slow_lock:
+            _slow_queries += 1
+        count = len(params) if isinstance(params, (list, tuple, dict)) else int(params is not None)
+        slow_query_logger.warning(
+            "Slow query (%.1f ms, %d row(s), %d param(s) redacted): %s",
+            seconds * 1000, rows, count, ' '.join(sql.split())
+        )
+
+
+def _endpoint():
+    # The URL rule, not the path, so /view_registration/1 and /2 share a series
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_db_seconds = 0.0
+
+
+def _finish_request(response):
+    if 'metrics_started' in g:
+        endpoint = _endpoint()
+        request_seconds.observe(time.perf_counter() - g.metrics_started,
+                                endpoint, request.method, str(response.status_code))
+        request_queries.observe(g.metrics_queries, endpoint)
+        request_db_seconds.observe(g.metrics_db_seconds, endpoint)
+    return response
+
+
+def _template_started(sender, template, context, **extra):
+    g.setdefault('metrics_templates', []).append(time.perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    stack = g.get('metrics_templates')
+    if stack:
+        template_seconds.observe(time.perf_counter() - stack.pop(), template.name or 'string')
+
+
+def init_app(app):
+    """Time every request and template; SLOW_QUERY_MS sets the slow-query threshold."""
+    global slow_query_seconds
+    slow_query_seconds = app.config.get('SLOW_QUERY_MS', 200) / 1000
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+
+
+def family(name, help_text, samples, kind='gauge'):
+    """Render one metric family; samples is a list of (label pairs, value)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{format_labels(pairs)} {format_value(value)}" for pairs, value in samples]
+    return lines
+
+
+def render(extra_lines=()):
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    lines += family('ems_db_slow_queries_total', "Statements slower than the slow-query threshold.",
+                    [([], _slow_queries)], 'counter')
+    lines += list(extra_lines)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,190 @@
+"""Apply schema migrations to an existing database.
+
+    python migrate.py                   # apply every pending migration
+    python migrate.py --status          # list applied and pending migrations
+    python migrate.py --baseline 002    # mark 001..002 as applied without running them
+
+Migrations live in migrations/ as NNN_description.sql or NNN_description.py
+and run in version order. Applied versions are recorded in the
+schema_migrations table; a fresh database built from schema.sql already
+lists every migration it contains. SQL files may use the mysql client's
+DELIMITER command for triggers. A Python migration defines migrate(db),
+receiving an open MySQLdb connection.
+
+MySQL commits DDL implicitly, so a migration that fails halfway is not
+rolled back: fix the cause, undo the partial change if needed and run
+again.
+
+With DB_BACKEND=sqlite the migrations do not apply: the database is built
+from schema_sqlite.sql, which includes all of them, and this script only
+creates or upgrades it if needed.
+"""
+import argparse
+import importlib.util
+import os
+import re
+
+from dotenv import load_dotenv
+from storage import create as create_storage
+
+load_dotenv()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.(sql|py)$')
+
+
+def connect():
+    import MySQLdb
+    return MySQLdb.connect(
+        host=os.getenv('MYSQL_HOST') or 'localhost',
+        user=os.getenv('MYSQL_USER'),
+        password=os.getenv('MYSQL_PASSWORD') or '',
+        database=os.getenv('MYSQL_DB'),
+        charset='utf8mb4'
+    )
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """[(version, name, path)] sorted by version."""
+    found = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            found.append((match.group(1), match.group(2), os.path.join(directory, filename)))
+    found.sort()
+    versions = [version for version, _, _ in found]
+    duplicates = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicates:
+        raise SystemExit(f"Duplicate migration version(s): {', '.join(duplicates)}")
+    return found
+
+
+def split_statements(sql):
+    """Split a SQL script into statements, honouring DELIMITER lines."""
+    statements = []
+    delimiter = ';'
+    current = []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        if not current and (not stripped or stripped.startswith('--')):
+            continue
+        current.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(current).rstrip()[:-len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            current = []
+    if '\n'.join(current).strip():
+        statements.append('\n'.join(current).strip())
+    return statements
+
+
+def ensure_table(db):
+    cursor = db.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(20) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    db.commit()
+    cursor.close()
+
+
+def applied_versions(db):
+    cursor = db.cursor()
+    cursor.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return versions
+
+
+def record(db, version, name):
+    cursor = db.cursor()
+    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+    db.commit()
+    cursor.close()
+
+
+def run_migration(db, path):
+    if path.endswith('.py'):
+        spec = importlib.util.spec_from_file_location(f"migration_{os.path.basename(path)[:-3]}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.migrate(db)
+    else:
+        with open(path, encoding='utf-8') as f:
+            statements = split_statements(f.read())
+        cursor = db.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    db.commit()
+
+
+def migrate(db, migrations=None):
+    """Apply pending migrations in order; returns the versions applied."""
+    ensure_table(db)
+    done = applied_versions(db)
+    applied = []
+    for version, name, path in migrations or discover():
+        if version in done:
+            continue
+        print(f"Applying {version}_{name} ...")
+        run_migration(db, path)
+        record(db, version, name)
+        applied.append(version)
+    return applied
+
+
+def baseline(db, up_to, migrations=None):
+    """Record migrations up to and including `up_to` as applied without running them."""
+    if not str(up_to).isdigit():
+        raise SystemExit(f"Invalid baseline version {up_to!r}: use a migration number, e.g. 002")
+    ensure_table(db)
+    done = applied_versions(db)
+    for version, name, _ in migrations or discover():
+        # Numerically, so that "2" means 002 rather than sorting after 008
+        if int(version) <= int(up_to) and version not in done:
+            record(db, version, name)
+            print(f"Marked {version}_{name} as applied")
+
+
+def status(db, migrations=None):
+    ensure_table(db)
+    done = applied_versions(db)
+    for version, name, _ in migrations or discover():
+        print(f"{'applied' if version in done else 'pending':8} {version}_{name}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument('--status', action='store_true', help="list migrations and exit")
+    parser.add_argument('--baseline', metavar='VERSION',
+                        help="mark migrations up to VERSION as applied without running them")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if (os.getenv('DB_BACKEND') or 'mysql').lower() == 'sqlite':
+        create_storage(os.environ).prepare()
+        print("SQLite database is up to date (schema_sqlite.sql).")
+        raise SystemExit(0)
+    db = connect()
+    try:
+        if args.status:
+            status(db)
+        elif args.baseline:
+            baseline(db, args.baseline)
+        else:
+            applied = migrate(db)
+            print(f"Applied {len(applied)} migration(s)." if applied else "Database is up to date.")
+    finally:
+        db.close()
@@ -0,0 +1,4 @@
+-- Keyset pagination and filtering for the /admin and /dashboard listings
+ALTER TABLE events
+    ADD INDEX idx_events_date_time_id (date, time, id),
+    ADD INDEX idx_events_location_date (location, date, time, id);
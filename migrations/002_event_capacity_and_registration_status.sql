@@ -0,0 +1,11 @@
+-- Event capacity (NULL means unlimited) and registration status for the waitlist
+ALTER TABLE events ADD COLUMN capacity INT NULL;
+
+-- The unique index below cannot be added while duplicates exist; keep the oldest
+DELETE r1 FROM registrations r1
+JOIN registrations r2 ON r1.event_id = r2.event_id AND r1.email = r2.email AND r1.id > r2.id;
+
+ALTER TABLE registrations
+    ADD COLUMN status ENUM('registered', 'waitlisted') NOT NULL DEFAULT 'registered',
+    ADD UNIQUE KEY uq_registrations_event_email (event_id, email),
+    ADD INDEX idx_registrations_event_status (event_id, status);
@@ -0,0 +1,51 @@
+-- Per-event registration counts maintained by triggers (see schema.sql)
+CREATE TABLE event_registration_counts (
+    event_id INT PRIMARY KEY,
+    registered INT NOT NULL DEFAULT 0,
+    waitlisted INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+);
+
+DELIMITER //
+CREATE TRIGGER trg_registrations_count_insert AFTER INSERT ON registrations
+FOR EACH ROW
+BEGIN
+    INSERT INTO event_registration_counts (event_id, registered, waitlisted)
+    VALUES (NEW.event_id, NEW.status = 'registered', NEW.status = 'waitlisted')
+    ON DUPLICATE KEY UPDATE
+        registered = registered + (NEW.status = 'registered'),
+        waitlisted = waitlisted + (NEW.status = 'waitlisted');
+END//
+
+CREATE TRIGGER trg_registrations_count_delete AFTER DELETE ON registrations
+FOR EACH ROW
+BEGIN
+    UPDATE event_registration_counts
+    SET registered = registered - (OLD.status = 'registered'),
+        waitlisted = waitlisted - (OLD.status = 'waitlisted')
+    WHERE event_id = OLD.event_id;
+END//
+
+CREATE TRIGGER trg_registrations_count_update AFTER UPDATE ON registrations
+FOR EACH ROW
+BEGIN
+    IF OLD.event_id <> NEW.event_id OR OLD.status <> NEW.status THEN
+        UPDATE event_registration_counts
+        SET registered = registered - (OLD.status = 'registered'),
+            waitlisted = waitlisted - (OLD.status = 'waitlisted')
+        WHERE event_id = OLD.event_id;
+        INSERT INTO event_registration_counts (event_id, registered, waitlisted)
+        VALUES (NEW.event_id, NEW.status = 'registered', NEW.status = 'waitlisted')
+        ON DUPLICATE KEY UPDATE
+            registered = registered + (NEW.status = 'registered'),
+            waitlisted = waitlisted + (NEW.status = 'waitlisted');
+    END IF;
+END//
+DELIMITER ;
+
+-- Fill from the existing rows (overwrites anything the triggers counted meanwhile)
+INSERT INTO event_registration_counts (event_id, registered, waitlisted)
+SELECT event_id, SUM(status = 'registered'), SUM(status = 'waitlisted')
+FROM registrations
+GROUP BY event_id
+ON DUPLICATE KEY UPDATE registered = VALUES(registered), waitlisted = VALUES(waitlisted);
@@ -0,0 +1,6 @@
+-- Link registrations to user accounts; attendees without an account keep NULL.
+-- (user_id, event_id) serves "my registrations" lookups and the foreign key.
+ALTER TABLE registrations
+    ADD COLUMN user_id INT NULL AFTER event_id,
+    ADD INDEX idx_registrations_user_event (user_id, event_id),
+    ADD CONSTRAINT fk_registrations_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL;
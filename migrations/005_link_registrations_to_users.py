@@ -0,0 +1,7 @@
+"""Backfill registrations.user_id from the matching user's email, in batches."""
+from registrations import link_users
+from storage import RegistrationRepository
+
+
+def migrate(db):
+    print(f"Linked {link_users(db, registrations=RegistrationRepository())} registration(s) to users.")
@@ -0,0 +1,5 @@
+-- Full-text indexes for /search (see search.py). Adding the first FULLTEXT
+-- index to an InnoDB table rebuilds it, so run this outside peak hours.
+ALTER TABLE events ADD FULLTEXT INDEX ft_events_name_location (name, location);
+ALTER TABLE registrations ADD FULLTEXT INDEX ft_registrations_name_email (name, email);
+ALTER TABLE users ADD FULLTEXT INDEX ft_users_name_email (name, email);
@@ -0,0 +1,5 @@
+-- Semester and year filters on the paginated /users list and roster export;
+-- each index also returns its rows in id order for keyset pagination
+ALTER TABLE users
+    ADD INDEX idx_users_semester_id (semester, id),
+    ADD INDEX idx_users_year_id (year, id);
@@ -0,0 +1,36 @@
+-- Sign-up times, and the hourly and daily sign-up rollups that analytics.py
+-- keeps from them (see schema.sql). Registrations that already exist get the
+-- time of the migration; run `python analytics.py` afterwards to fill the
+-- rollups, or let the app's compaction thread do it.
+ALTER TABLE registrations
+    ADD COLUMN created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD INDEX idx_registrations_created_at (created_at);
+
+CREATE TABLE registration_rollup_hourly (
+    bucket DATETIME NOT NULL,  -- start of the hour
+    event_id INT NOT NULL,
+    semester INT NOT NULL DEFAULT 0,
+    year INT NOT NULL DEFAULT 0,
+    signups INT NOT NULL,
+    PRIMARY KEY (bucket, event_id, semester, year),
+    INDEX idx_rollup_hourly_event (event_id, bucket),
+    FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+);
+
+CREATE TABLE registration_rollup_daily (
+    bucket DATE NOT NULL,
+    event_id INT NOT NULL,
+    semester INT NOT NULL DEFAULT 0,
+    year INT NOT NULL DEFAULT 0,
+    signups INT NOT NULL,
+    PRIMARY KEY (bucket, event_id, semester, year),
+    INDEX idx_rollup_daily_event (event_id, bucket),
+    FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+);
+
+CREATE TABLE rollup_state (
+    name VARCHAR(50) PRIMARY KEY,
+    compacted_at DATETIME NULL
+);
+
+INSERT INTO rollup_state (name) VALUES ('registrations');
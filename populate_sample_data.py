@@ -1,162 +1,340 @@
+"""Generate sample data for development and load testing.
+
+    python populate_sample_data.py                          # 100 users, 10 events
+    python populate_sample_data.py --users 1000000 --events 5000 \\
+        --registrations 3000000 --workers 8 --seed 42
+
+Rows are inserted with batched executemany calls (one multi-row INSERT and
+one commit per --batch-size rows), optionally split across worker
+processes. Generated users all share the password "password" by default, so
+only one hash is computed; --password-mode unique gives user N the password
+"passwordN", hashed with the cheap --hash-method.
+"""
+import argparse
 import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import islice
+from multiprocessing import Pool
+
 from faker import Faker
 from werkzeug.security import generate_password_hash
-import random
-from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import MySQLdb
+
+from analytics import compact
+from registrations import link_users
+from storage import create as create_storage
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Faker
-fake = Faker()
+ADMIN_EMAIL = 'admin@admin.com'
+SHARED_PASSWORD = 'password'
+# Sign-up times are spread over this many days before now, for /admin/analytics
+SIGNUP_DAYS = 30
 
-# Database connection
-db = MySQLdb.connect(
-    host=os.getenv('MYSQL_HOST'),
-    user=os.getenv('MYSQL_USER'),
-    password=os.getenv('MYSQL_PASSWORD'),
-    database=os.getenv('MYSQL_DB')
-)
+EVENT_NAMES = [
+    "Tech Symposium",
+    "Annual Cultural Fest",
+    "Coding Competition",
+    "Alumni Meet",
+    "Career Fair",
+    "Sports Day",
+    "Science Exhibition",
+    "Literary Fest",
+    "Startup Pitch",
+    "Music Concert",
+    "Art Workshop",
+    "Debate Championship",
+    "Hackathon",
+    "Robotics Competition",
+    "Theater Performance"
+]
 
-cursor = db.cursor()
+LOCATIONS = [
+    "Main Auditorium",
+    "Sports Complex",
+    "Block A Seminar Hall",
+    "Open Air Theater",
+    "Computer Lab 3",
+    "Library Conference Room",
+    "Admin Building Hall"
+]
 
-def create_sample_users(num_users=100):
-    """Generate and insert sample users into the database"""
-    try:
-        # Clear existing users (except admin)
-        cursor.execute("DELETE FROM users WHERE email != 'admin@admin.com'")
-        
-        # Insert admin user if not exists
-        cursor.execute("SELECT * FROM users WHERE email = 'admin@admin.com'")
-        if not cursor.fetchone():
-            cursor.execute(
-                "INSERT INTO users (registration_number, name, email, password, semester, year) "
-                "VALUES (%s, %s, %s, %s, %s, %s)",
-                ("ADMIN001", "Admin User", "admin@admin.com", 
-                 generate_password_hash("admin123"), None, None)
-            )
-        
-        # Generate sample users
-        for i in range(1, num_users + 1):
-            reg_number = f"STD{str(i).zfill(3)}"
-            name = fake.name()
-            email = f"user{i}@example.com"
-            password = generate_password_hash(f"password{i}")
-            semester = random.randint(1, 2)
-            year = 1
-            
-            cursor.execute(
-                "INSERT INTO users (registration_number, name, email, password, semester, year) "
-                "VALUES (%s, %s, %s, %s, %s, %s)",
-                (reg_number, name, email, password, semester, year)
-            )
-        
+
+@lru_cache(maxsize=None)
+def storage():
+    """The DB_BACKEND storage backend, configured from the environment."""
+    return create_storage(os.environ)
+
+
+def connect():
+    """Open a connection to the DB_BACKEND database (MYSQL_* or SQLITE_PATH)."""
+    return storage().connect()
+
+
+@lru_cache(maxsize=None)
+def name_pools(seed):
+    """First and last name pools drawn once per process from a seeded Faker."""
+    fake = Faker()
+    fake.seed_instance(seed)
+    first_names = [fake.first_name() for _ in range(500)]
+    last_names = [fake.last_name() for _ in range(500)]
+    return first_names, last_names
+
+
+def user_email(i):
+    return f"user{i}@example.com"
+
+
+def user_name(i, seed):
+    """Deterministic name for user i, so any process can rebuild it without a query."""
+    first_names, last_names = name_pools(seed)
+    return f"{first_names[(i * 7919) % len(first_names)]} {last_names[(i * 104729) % len(last_names)]}"
+
+
+def insert_batches(db, insert, rows, batch_size):
+    """Pass an iterable of rows to insert(cursor, batch) in batches of batch_size, committing after each."""
+    cursor = db.cursor()
+    rows = iter(rows)
+    inserted = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        insert(cursor, batch)
         db.commit()
-        print(f"Successfully inserted {num_users} sample users.")
-    except Exception as e:
-        db.rollback()
-        print(f"Error creating users: {e}")
+        inserted += len(batch)
+    cursor.close()
+    return inserted
+
+
+def split_range(start, stop, parts):
+    """Split [start, stop) into at most `parts` contiguous (start, stop) chunks."""
+    size = max(1, -(-(stop - start) // max(1, parts)))
+    return [(low, min(low + size, stop)) for low in range(start, stop, size)]
+
+
+def run_tasks(function, tasks, workers):
+    """Run tasks inline or on a process pool and return the summed results."""
+    if workers <= 1 or len(tasks) <= 1:
+        return sum(function(task) for task in tasks)
+    with Pool(workers) as pool:
+        return sum(pool.imap_unordered(function, tasks))
+
 
-def create_sample_events(num_events=10):
-    """Generate and insert sample events into the database"""
+def clear_existing_data(db, keep_users=False):
+    """Remove previously generated rows, keeping the admin user."""
+    cursor = db.cursor()
+    # TRUNCATE skips the count triggers, so clear the counts too
+    storage().reset_tables(cursor, ['event_registration_counts', 'registration_rollup_hourly',
+                                    'registration_rollup_daily', 'registrations', 'events'])
+    users = storage().users
+    if not keep_users:
+        users.delete_all_except(cursor, ADMIN_EMAIL)
+    if not users.ids_by_email(cursor, [ADMIN_EMAIL]):
+        users.create(cursor, "ADMIN001", "Admin User", ADMIN_EMAIL, generate_password_hash("admin123"))
+    db.commit()
+    cursor.close()
+
+
+def _insert_users(task):
+    start, stop, seed, batch_size, password_hash, hash_method = task
+    rng = random.Random(seed * 1000003 + start)
+
+    def rows():
+        for i in range(start, stop):
+            if password_hash is None:
+                password = generate_password_hash(f"password{i}", method=hash_method)
+            else:
+                password = password_hash
+            yield (f"STD{str(i).zfill(7)}", user_name(i, seed), user_email(i), password,
+                   rng.randint(1, 8), rng.randint(1, 4))
+
+    db = connect()
     try:
-        # Clear existing events
-        cursor.execute("DELETE FROM events")
-        
-        # Sample event names
-        event_names = [
-            "Tech Symposium 2023",
-            "Annual Cultural Fest",
-            "Coding Competition",
-            "Alumni Meet",
-            "Career Fair",
-            "Sports Day",
-            "Science Exhibition",
-            "Literary Fest",
-            "Startup Pitch",
-            "Music Concert",
-            "Art Workshop",
-            "Debate Championship",
-            "Hackathon",
-            "Robotics Competition",
-            "Theater Performance"
-        ]
-        
-        # Generate sample events
-        for i in range(1, num_events + 1):
-            name = random.choice(event_names)
-            # Ensure unique event names
-            event_names.remove(name)
-            
-            date = (datetime.now() + timedelta(days=random.randint(1, 365))).strftime('%Y-%m-%d')
-            time = f"{random.randint(9, 18)}:{random.choice(['00', '30'])}"
-            location = random.choice([
-                "Main Auditorium",
-                "Sports Complex",
-                "Block A Seminar Hall",
-                "Open Air Theater",
-                "Computer Lab 3",
-                "Library Conference Room",
-                "Admin Building Hall"
-            ])
-            
-            cursor.execute(
-                "INSERT INTO events (name, date, time, location) "
-                "VALUES (%s, %s, %s, %s)",
-                (name, date, time, location)
-            )
-        
-        db.commit()
-        print(f"Successfully inserted {num_events} sample events.")
-    except Exception as e:
-        db.rollback()
-        print(f"Error creating events: {e}")
+        return insert_batches(db, storage().users.insert_many, rows(), batch_size)
+    finally:
+        db.close()
+
 
-def create_sample_registrations():
-    """Create sample registrations for events"""
+def create_sample_users(num_users=100, seed=0, batch_size=5000, workers=1,
+                        password_mode='shared', hash_method='pbkdf2:sha256:1000'):
+    """Insert users user1..userN@example.com."""
+    # Shared mode hashes once and reuses it for every row
+    password_hash = generate_password_hash(SHARED_PASSWORD) if password_mode == 'shared' else None
+    tasks = [
+        (start, stop, seed, batch_size, password_hash, hash_method)
+        for start, stop in split_range(1, num_users + 1, workers * 4)
+    ]
+    inserted = run_tasks(_insert_users, tasks, workers)
+    print(f"Successfully inserted {inserted} sample users.")
+    return inserted
+
+
+def create_sample_events(db, num_events=10, seed=0, batch_size=5000):
+    """Insert events spread over the next year and return their ids."""
+    rng = random.Random(seed)
+    today = datetime.now()
+    rows = []
+    for i in range(1, num_events + 1):
+        name = EVENT_NAMES[(i - 1) % len(EVENT_NAMES)]
+        if num_events > len(EVENT_NAMES):
+            name = f"{name} #{(i - 1) // len(EVENT_NAMES) + 1}"
+        date = (today + timedelta(days=rng.randint(1, 365))).strftime('%Y-%m-%d')
+        time_of_day = f"{rng.randint(9, 18)}:{rng.choice(['00', '30'])}"
+        rows.append((name, date, time_of_day, rng.choice(LOCATIONS), None))
+
+    insert_batches(db, storage().events.insert_many, rows, batch_size)
+    cursor = db.cursor()
+    event_ids = storage().events.ids(cursor)
+    cursor.close()
+    print(f"Successfully inserted {len(event_ids)} sample events.")
+    return event_ids
+
+
+# Set by _init_registration_worker when registrants come from existing users
+_directory = None
+
+
+def _init_registration_worker(directory):
+    global _directory
+    _directory = directory
+
+
+def _insert_registrations(task):
+    events, seed, num_users, batch_size, now = task
+
+    def rows():
+        for event_id, count in events:
+            rng = random.Random(seed * 1000003 + event_id)
+            for i in rng.sample(range(num_users), min(count, num_users)):
+                if _directory is not None:
+                    email, name = _directory[i]
+                else:
+                    email, name = user_email(i + 1), user_name(i + 1, seed)
+                created_at = now - timedelta(seconds=rng.randrange(SIGNUP_DAYS * 86400))
+                yield (event_id, name, email, created_at.strftime('%Y-%m-%d %H:%M:%S'))
+
+    db = connect()
     try:
-        # Clear existing registrations
-        cursor.execute("DELETE FROM registrations")
-        
-        # Get all user emails
-        cursor.execute("SELECT email FROM users WHERE email != 'admin@admin.com'")
-        user_emails = [row[0] for row in cursor.fetchall()]
-        
-        # Get all event IDs
-        cursor.execute("SELECT id FROM events")
-        event_ids = [row[0] for row in cursor.fetchall()]
-        
-        # Create registrations
-        for event_id in event_ids:
-            # Each event will have between 5 and 20 registrations
-            num_registrations = random.randint(5, 20)
-            registrants = random.sample(user_emails, min(num_registrations, len(user_emails)))
-            
-            for email in registrants:
-                cursor.execute("SELECT name FROM users WHERE email = %s", (email,))
-                name = cursor.fetchone()[0]
-                
-                cursor.execute(
-                    "INSERT INTO registrations (event_id, name, email) "
-                    "VALUES (%s, %s, %s)",
-                    (event_id, name, email)
-                )
-        
-        db.commit()
-        print("Successfully created sample registrations.")
-    except Exception as e:
-        db.rollback()
-        print(f"Error creating registrations: {e}")
+        return insert_batches(db, storage().registrations.insert_backdated, rows(), batch_size)
+    finally:
+        db.close()
+
+
+def create_sample_registrations(db, event_ids, num_registrations, num_users=None,
+                                seed=0, batch_size=5000, workers=1):
+    """Register distinct users for events, about num_registrations in total.
+
+    Registrant names come from an in-memory email -> name directory: derived
+    from the user index for users generated in this run, or loaded with a
+    single query when num_users is None (existing users).
+    """
+    directory = None
+    if num_users is None:
+        cursor = db.cursor()
+        directory = storage().users.contacts_except(cursor, ADMIN_EMAIL)
+        cursor.close()
+        num_users = len(directory)
+    if not event_ids or not num_users:
+        print("No users or events to register.")
+        return 0
+
+    # Spread the total evenly, with the remainder going to the first events
+    per_event, remainder = divmod(num_registrations, len(event_ids))
+    counts = [(event_id, per_event + (1 if n < remainder else 0)) for n, event_id in enumerate(event_ids)]
+    chunk = max(1, -(-len(counts) // (workers * 4)))
+    # The database's clock: SQLite's CURRENT_TIMESTAMP is UTC, MySQL's is local
+    now = datetime.now(timezone.utc).replace(tzinfo=None) if storage().name == 'sqlite' else datetime.now()
+    tasks = [(counts[n:n + chunk], seed, num_users, batch_size, now) for n in range(0, len(counts), chunk)]
+
+    _init_registration_worker(directory)
+    if workers <= 1 or len(tasks) <= 1:
+        inserted = sum(_insert_registrations(task) for task in tasks)
+    else:
+        with Pool(workers, initializer=_init_registration_worker, initargs=(directory,)) as pool:
+            inserted = sum(pool.imap_unordered(_insert_registrations, tasks))
+    # One set-based pass links the new rows to their users (user_id)
+    link_users(db, batch_size, storage().registrations)
+    compact(db, rebuild=True, repository=storage().analytics)
+    print(f"Successfully created {inserted} sample registrations.")
+    return inserted
+
+
+def notify_app_servers():
+    """Bump the shared data version so running app servers stop answering 304 for old pages."""
+    url = os.getenv('CACHE_URL')
+    if url and url.startswith(('redis://', 'rediss://')):
+        from cache import create_cache
+        from httpcache import DataVersion
+        cache = create_cache(url)
+        cache.invalidate('event_lists')
+        DataVersion(cache.backend, shared=True).bump()
+
+
+def generate(users=100, events=10, registrations=None, seed=0, batch_size=5000, workers=1,
+             password_mode='shared', hash_method='pbkdf2:sha256:1000'):
+    """Replace the database contents with a generated dataset and return row counts."""
+    if registrations is None:
+        registrations = events * 12
+    db = connect()
+    try:
+        timings = {}
+        started = time.perf_counter()
+        # --users 0 keeps the existing users and registers them instead
+        clear_existing_data(db, keep_users=not users)
+
+        step = time.perf_counter()
+        user_count = create_sample_users(users, seed, batch_size, workers, password_mode, hash_method)
+        timings['users'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        event_ids = create_sample_events(db, events, seed, batch_size)
+        timings['events'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        registration_count = create_sample_registrations(
+            db, event_ids, registrations, users if users else None, seed, batch_size, workers)
+        timings['registrations'] = time.perf_counter() - step
+        timings['total'] = time.perf_counter() - started
+    finally:
+        db.close()
+    notify_app_servers()
+
+    return {
+        'users': user_count,
+        'events': len(event_ids),
+        'registrations': registration_count,
+        'seconds': {step: round(elapsed, 2) for step, elapsed in timings.items()},
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Populate the database with generated sample data.")
+    parser.add_argument('--users', type=int, default=100, help="number of users (default 100; 0 keeps existing users)")
+    parser.add_argument('--events', type=int, default=10, help="number of events (default 10)")
+    parser.add_argument('--registrations', type=int, default=None,
+                        help="total registrations (default 12 per event)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for reproducible data")
+    parser.add_argument('--batch-size', type=int, default=5000, help="rows per insert batch and commit")
+    parser.add_argument('--workers', type=int, default=1, help="parallel worker processes")
+    parser.add_argument('--password-mode', choices=['shared', 'unique'], default='shared',
+                        help=f"shared: every user's password is '{SHARED_PASSWORD}' (one hash); "
+                             "unique: user N gets 'passwordN'")
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:1000',
+                        help="werkzeug hash method for --password-mode unique")
+    return parser.parse_args(argv)
+
 
 if __name__ == '__main__':
+    args = parse_args()
     print("Starting to populate sample data...")
-    
-    create_sample_users(100)
-    create_sample_events(10)
-    create_sample_registrations()
-    
-    cursor.close()
-    db.close()
-    print("Sample data population completed.")
\ No newline at end of file
+    result = generate(
+        users=args.users, events=args.events, registrations=args.registrations,
+        seed=args.seed, batch_size=args.batch_size, workers=args.workers,
+        password_mode=args.password_mode, hash_method=args.hash_method
+    )
+    print(f"Sample data population completed in {result['seconds']['total']}s.")
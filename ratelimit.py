@@ -0,0 +1,268 @@
+"""Admission control: token-bucket rate limits and a concurrency cap.
+
+Rate limits protect the expensive entry points (login, sign-up, password
+reset) from retry storms. Each Limit is a token bucket: it allows `count`
+requests in a burst and refills at count/period per second. Buckets are
+keyed per client IP, per account or per route. A request that finds a
+bucket empty is answered at once with 429 and Retry-After, before any
+query, password hash or template render.
+
+Buckets live in a pluggable backend: an in-process MemoryBuckets by
+default, or RedisBuckets when RATE_LIMIT_URL points at a redis:// server,
+so that all workers share one budget per client. If Redis cannot be
+reached, MemoryBuckets stands in locally and each worker enforces the
+limits on its own, rather than rejecting or waving through all traffic.
+
+ConcurrencyLimit caps the requests in progress per process. Past the cap,
+a request fails fast with 429 instead of queueing for a database
+connection, so an overload sheds the excess and latency stays flat for the
+requests that are admitted.
+
+Client IPs come from request.remote_addr. Behind a reverse proxy, wrap the
+app in werkzeug's ProxyFix so that this is the client's address rather
+than the proxy's.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, jsonify, request, session
+
+MAX_KEYS = 100000
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBuckets:
+    """In-process token buckets, least recently used dropped past max_keys."""
+
+    def __init__(self, max_keys=MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take a token; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+# Refill and take in one atomic step; the bucket expires once it would be full
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker (requires the `redis` package)."""
+
+    def __init__(self, url, prefix='ems:rl:', fallback=None):
+        import redis
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, socket_timeout=0.2)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+        self._prefix = prefix
+        self.fallback = fallback or MemoryBuckets()
+
+    def take(self, key, rate, burst):
+        try:
+            return float(self._take(keys=[self._prefix + key], args=[rate, burst, time.time()]))
+        except self._errors:
+            logger.warning("Rate limit backend unavailable; limiting in-process", exc_info=True)
+            return self.fallback.take(key, rate, burst)
+
+
+def create_buckets(url=None):
+    """Build a bucket backend from a RATE_LIMIT_URL value ('memory://' or 'redis://...')."""
+    if url and url.startswith(('redis://', 'rediss://')):
+        return RedisBuckets(url)
+    return MemoryBuckets()
+
+
+# Bucket keys: a callable returning the key for the current request, or None
+# to skip the limit for it
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def form_field(name):
+    """Key on a submitted form field, e.g. the email being logged into."""
+    def key():
+        value = (request.form.get(name) or '').strip().lower()
+        return value or None
+    return key
+
+
+def form_field_from_client(name):
+    """Key on a submitted form field together with the client IP.
+
+    Used for login: failed attempts from one client cannot use up the
+    account's budget for every other client, so nobody can lock a victim out.
+    """
+    field = form_field(name)
+
+    def key():
+        value = field()
+        return f"{value}|{client_ip()}" if value else None
+    return key
+
+
+def session_account():
+    return session.get('user_id') or session.get('email')
+
+
+def route():
+    """One bucket for the route, shared by every client."""
+    return request.endpoint
+
+
+class Limit:
+    """At most `count` requests per `period` seconds per key, in bursts of up to `count`."""
+
+    def __init__(self, name, count, period, key):
+        self.name = name
+        self.count = count
+        self.period = period
+        self.key = key
+
+    @property
+    def rate(self):
+        return self.count / self.period
+
+
+def too_many_requests(retry_after):
+    """A cheap 429: no template, JSON for API clients."""
+    seconds = max(1, math.ceil(retry_after))
+    message = f"Too many requests. Please try again in {seconds} second(s)."
+    if request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+        response = jsonify(error=message)
+        response.status_code = 429
+    else:
+        response = current_app.response_class(message, 429, mimetype='text/plain')
+    response.headers['Retry-After'] = str(seconds)
+    return response
+
+
+class RateLimiter:
+    """Applies Limits to views; see the module docstring."""
+
+    def __init__(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._limited = {}
+
+    def check(self, limits):
+        """Take a token from each limit's bucket; returns 0 or the longest wait."""
+        wait = 0.0
+        for limit in limits:
+            key = limit.key()
+            if key is None:
+                continue
+            limit_wait = self.backend.take(f"{limit.name}:{key}", limit.rate, limit.count)
+            if limit_wait:
+                with self._lock:
+                    self._limited[limit.name] = self._limited.get(limit.name, 0) + 1
+                wait = max(wait, limit_wait)
+        return wait
+
+    def limit(self, *limits, methods=('POST',)):
+        """Decorator rate-limiting a view's `methods` requests; others pass freely."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.enabled and request.method in methods:
+                    wait = self.check(limits)
+                    if wait:
+                        return too_many_requests(wait)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """{limit name: requests rejected} for this process."""
+        with self._lock:
+            return dict(self._limited)
+
+
+class ConcurrencyLimit:
+    """At most `limit` requests in progress per process; the rest get 429.
+
+    A request waits up to `wait` seconds for a slot (0: fail at once).
+    Endpoints in `exempt` are always admitted, so static files and
+    monitoring keep working during an overload. A limit of 0 disables it.
+    """
+
+    def __init__(self, limit, wait=0.0, retry_after=1, exempt=('static',)):
+        self.limit = limit
+        self.wait = wait
+        self.retry_after = retry_after
+        self.exempt = set(exempt)
+        self._slots = threading.BoundedSemaphore(limit) if limit else None
+        self._lock = threading.Lock()
+        self._stats = {'in_flight': 0, 'rejected': 0}
+
+    def _count(self, field, delta=1):
+        with self._lock:
+            self._stats[field] += delta
+
+    def admit(self):
+        """before_request hook."""
+        if not self._slots or request.endpoint in self.exempt:
+            return None
+        if self.wait:
+            admitted = self._slots.acquire(timeout=self.wait)
+        else:
+            admitted = self._slots.acquire(blocking=False)
+        if not admitted:
+            self._count('rejected')
+            return too_many_requests(self.retry_after)
+        g.admitted = True
+        self._count('in_flight')
+        return None
+
+    def release(self, exc=None):
+        """teardown_request hook."""
+        if g.pop('admitted', False):
+            self._count('in_flight', -1)
+            self._slots.release()
+
+    def init_app(self, app):
+        app.before_request(self.admit)
+        app.teardown_request(self.release)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['limit'] = self.limit
+        return stats
@@ -0,0 +1,109 @@
+"""Bulk import of registrations from an uploaded CSV file.
+
+The file needs an `event_id,name,email` header. Rows are validated one by
+one, then checked and inserted in batches: each batch locks its events and
+counts their free seats, looks up existing registrations in one query and
+inserts with one multi-row INSERT (executemany), all committed as a single
+transaction. Imported attendees take free seats in file order; the rest of
+an event's rows are waitlisted.
+"""
+import csv
+import io
+
+from registrations import DUPLICATE, NOT_FOUND, WAITLISTED, register_batch
+
+IMPORT_BATCH_SIZE = 500
+REQUIRED_COLUMNS = ('event_id', 'name', 'email')
+
+
+def read_rows(stream):
+    """Yield (line_number, row) pairs from an uploaded CSV file.
+
+    Raises ValueError if the header is missing a required column.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    fields = [(name or '').strip().lower() for name in (reader.fieldnames or [])]
+    missing = [column for column in REQUIRED_COLUMNS if column not in fields]
+    if missing:
+        raise ValueError(f"CSV header is missing column(s): {', '.join(missing)}")
+    reader.fieldnames = fields
+    for row in reader:
+        yield reader.line_num, row
+
+
+def import_registrations(connection, rows, validate, batch_size=IMPORT_BATCH_SIZE):
+    """Import rows and return a per-row report.
+
+    `validate(name, email)` returns a list of error messages for a row. Each
+    report entry is a dict with line, event_id, name, email, status
+    ('imported', 'duplicate', 'invalid' or 'error') and message.
+    """
+    report = []
+    pending = []
+    seen = set()
+
+    for line, row in rows:
+        event_id = (row.get('event_id') or '').strip()
+        name = (row.get('name') or '').strip()
+        email = (row.get('email') or '').strip()
+        entry = {'line': line, 'event_id': event_id, 'name': name, 'email': email,
+                 'status': 'invalid', 'message': ''}
+        report.append(entry)
+
+        errors = validate(name, email)
+        try:
+            entry['event_id'] = int(event_id)
+        except ValueError:
+            errors.append("Invalid event ID.")
+        if errors:
+            entry['message'] = ' '.join(errors)
+            continue
+
+        key = (entry['event_id'], email.lower())
+        if key in seen:
+            entry['status'] = 'duplicate'
+            entry['message'] = "Duplicate of an earlier row in this file."
+            continue
+        seen.add(key)
+
+        pending.append(entry)
+        if len(pending) >= batch_size:
+            _import_batch(connection, pending)
+            pending = []
+
+    if pending:
+        _import_batch(connection, pending)
+    return report
+
+
+def summarize(report):
+    counts = {'imported': 0, 'duplicate': 0, 'invalid': 0, 'error': 0}
+    for entry in report:
+        counts[entry['status']] += 1
+    return counts
+
+
+def _import_batch(connection, batch):
+    cur = connection.cursor()
+    try:
+        statuses = register_batch(
+            cur, [(entry['event_id'], entry['name'], entry['email']) for entry in batch])
+        connection.commit()
+        for entry, status in zip(batch, statuses):
+            if status == NOT_FOUND:
+                entry['message'] = f"Event {entry['event_id']} does not exist."
+            elif status == DUPLICATE:
+                entry['status'] = 'duplicate'
+                entry['message'] = "Already registered for this event."
+            else:
+                entry['status'] = 'imported'
+                if status == WAITLISTED:
+                    entry['message'] = "Event is full; added to the waitlist."
+    except Exception as e:
+        connection.rollback()
+        for entry in batch:
+            entry['status'] = 'error'
+            entry['message'] = f"Batch failed: {str(e)}"
+    finally:
+        cur.close()
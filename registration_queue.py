@@ -0,0 +1,228 @@
+"""Write-behind registration queue.
+
+With REGISTRATION_QUEUE set, a sign-up is validated, written to a local
+SQLite file (WAL mode, so appends are cheap and survive a restart) and
+acknowledged with a ticket id straight away. A background worker drains the
+queue into the database in batches: one transaction and one multi-row
+INSERT per batch (registrations.register_batch) instead of one commit per
+sign-up, so the database commit rate no longer caps sign-ups during a rush.
+
+Ticket states: queued -> processing -> registered / waitlisted /
+duplicate / not_found, or error once a batch has failed MAX_ATTEMPTS
+times. Batches left in 'processing' by a crashed worker are queued again
+after STALE_AFTER seconds; a registration that did commit before the crash
+then reports 'duplicate'.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import db
+import registrations as registration_service
+
+QUEUED = 'queued'
+PROCESSING = 'processing'
+ERROR = 'error'
+
+QUEUE_BATCH_SIZE = 500
+POLL_INTERVAL = 1.0
+STALE_AFTER = 300
+MAX_ATTEMPTS = 5
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tickets (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        ticket TEXT NOT NULL UNIQUE,
+        event_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'queued',
+        message TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        claimed_by TEXT,
+        created_at REAL NOT NULL,
+        claimed_at REAL,
+        processed_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_tickets_state_seq ON tickets (state, seq);
+"""
+
+
+class RegistrationQueue:
+    """Durable local queue plus the worker thread that drains it."""
+
+    def __init__(self, path, batch_size=QUEUE_BATCH_SIZE, poll_interval=POLL_INTERVAL, on_write=None):
+        self.path = path
+        self.on_write = on_write
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Survives a crash of the app; only an OS crash can lose the last commits
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _conn(self):
+        # sqlite3 connections are per thread (and must not cross a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, event_id, name, email):
+        """Persist a registration request and return its ticket id."""
+        ticket = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO tickets (ticket, event_id, name, email, created_at) VALUES (?, ?, ?, ?, ?)",
+            (ticket, int(event_id), name, email, time.time())
+        )
+        self.start_worker()
+        self._wakeup.set()
+        return ticket
+
+    def status(self, ticket):
+        """The ticket's state as a dict, or None for an unknown ticket."""
+        row = self._conn().execute(
+            "SELECT ticket, event_id, state, message, created_at, processed_at "
+            "FROM tickets WHERE ticket = ?",
+            (ticket,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('ticket', 'event_id', 'state', 'message', 'created_at', 'processed_at'), row))
+
+    def stats(self):
+        counts = dict(self._conn().execute("SELECT state, COUNT(*) FROM tickets GROUP BY state").fetchall())
+        counts['worker_alive'] = bool(self._worker and self._worker.is_alive()
+                                      and self._worker_pid == os.getpid())
+        return counts
+
+    # Worker side
+
+    def claim(self, limit):
+        """Atomically move up to `limit` queued tickets to 'processing'.
+
+        Safe with several processes sharing the file: SQLite serialises the
+        claiming UPDATE, so every ticket is handed to one worker.
+        """
+        conn = self._conn()
+        worker_id = f"{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex[:8]}"
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE tickets SET state = ?, claimed_by = NULL WHERE state = ? AND claimed_at < ?",
+                (QUEUED, PROCESSING, now - STALE_AFTER)
+            )
+            conn.execute(
+                "UPDATE tickets SET state = ?, claimed_by = ?, claimed_at = ?, attempts = attempts + 1 "
+                "WHERE seq IN (SELECT seq FROM tickets WHERE state = ? ORDER BY seq LIMIT ?)",
+                (PROCESSING, worker_id, now, QUEUED, limit)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.execute(
+            "SELECT ticket, event_id, name, email, attempts FROM tickets "
+            "WHERE claimed_by = ? AND state = ? ORDER BY seq",
+            (worker_id, PROCESSING)
+        ).fetchall()
+
+    def complete(self, results):
+        """Record final states; results is a list of (ticket, state)."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "UPDATE tickets SET state = ?, message = NULL, processed_at = ?, claimed_by = NULL WHERE ticket = ?",
+            [(state, now, ticket) for ticket, state in results]
+        )
+        conn.execute("COMMIT")
+
+    def retry(self, batch, message):
+        """Put a failed batch back on the queue, or fail tickets out of attempts."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "UPDATE tickets SET state = ?, message = ?, claimed_by = NULL, processed_at = ? WHERE ticket = ?",
+            [(ERROR if attempts >= MAX_ATTEMPTS else QUEUED, message,
+              now if attempts >= MAX_ATTEMPTS else None, ticket)
+             for ticket, _, _, _, attempts in batch]
+        )
+        conn.execute("COMMIT")
+
+    def process_batch(self):
+        """Drain one batch into the database; returns the number of tickets handled.
+
+        A failed batch is put back on the queue and the error re-raised.
+        """
+        batch = self.claim(self.batch_size)
+        if not batch:
+            return 0
+        attendees = [(event_id, name, email) for _, event_id, name, email, _ in batch]
+        try:
+            statuses = self._write(attendees)
+        except Exception as e:
+            # The worker waits a poll interval before claiming again
+            self.retry(batch, str(e))
+            raise
+        self.complete([(row[0], status) for row, status in zip(batch, statuses)])
+        written = {registration_service.REGISTERED, registration_service.WAITLISTED}
+        if self.on_write and written.intersection(statuses):
+            self.on_write()
+        return len(batch)
+
+    def _write(self, attendees):
+        with db.pool.connection() as connection:
+            for attempt in range(1, registration_service.MAX_ATTEMPTS + 1):
+                cur = connection.cursor()
+                try:
+                    statuses = registration_service.register_batch(cur, attendees)
+                    connection.commit()
+                    return statuses
+                except Exception as e:
+                    connection.rollback()
+                    if not db.storage.is_retryable(e) or attempt == registration_service.MAX_ATTEMPTS:
+                        raise
+                finally:
+                    cur.close()
+
+    def run(self):
+        while True:
+            try:
+                if self.process_batch():
+                    continue
+            except Exception:
+                logger.exception("Registration queue batch failed")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start_worker(self):
+        """Start the drain thread once per process (lazily, so after any fork)."""
+        if self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._wakeup = threading.Event()
+            self._worker = threading.Thread(target=self.run, name='registration-queue', daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
@@ -0,0 +1,149 @@
+"""Capacity-aware event registration.
+
+A registration is a single conditional INSERT ... SELECT: it locks the event
+row, counts the seats already taken and inserts the attendee as
+'registered' only if a seat is free. There is no read-then-write window:
+concurrent sign-ups for the same event queue on the event row lock, and the
+UNIQUE (event_id, email) index rejects duplicates. When the fast path does
+not insert (event full, duplicate or unknown event), one more statement puts
+the attendee on the waitlist.
+
+Registrations are linked to the user account with the same email (user_id);
+attendees without an account keep user_id NULL.
+
+The SQL is in the storage backend's RegistrationRepository (storage.py);
+this module decides what the results mean.
+"""
+import db
+
+REGISTERED = 'registered'
+WAITLISTED = 'waitlisted'
+DUPLICATE = 'duplicate'
+NOT_FOUND = 'not_found'
+
+MAX_ATTEMPTS = 3
+
+
+def register_attendee(connection, event_id, name, email):
+    """Register name/email for an event and commit.
+
+    Returns REGISTERED, WAITLISTED, DUPLICATE or NOT_FOUND.
+    """
+    store = db.storage
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        cur = connection.cursor()
+        try:
+            if store.registrations.register_if_free(cur, event_id, name, email):
+                status = REGISTERED
+            elif store.registrations.waitlist(cur, event_id, name, email):
+                status = WAITLISTED
+            else:
+                status = DUPLICATE if store.events.exists(cur, event_id) else NOT_FOUND
+            connection.commit()
+            return status
+        except Exception as e:
+            connection.rollback()
+            # Deadlocks and lock timeouts are safe to retry
+            if not store.is_retryable(e) or attempt == MAX_ATTEMPTS:
+                raise
+        finally:
+            cur.close()
+
+
+def lock_seats(cur, event_ids):
+    """Lock events for a batch insert and return {event_id: free seats}.
+
+    Free seats is None for events without a capacity; unknown events are
+    left out. The locks are the same ones register_attendee takes, so seats
+    handed out by the caller cannot be taken concurrently before it commits.
+    """
+    capacities = db.storage.events.lock_capacities(cur, event_ids)
+    if not capacities:
+        return {}
+    taken = db.storage.registrations.taken_seats(cur, event_ids)
+    return {
+        event_id: None if capacity is None else max(0, capacity - taken.get(event_id, 0))
+        for event_id, capacity in capacities.items()
+    }
+
+
+def register_batch(cur, attendees):
+    """Insert many (event_id, name, email) attendees with one executemany.
+
+    Runs in the caller's transaction and returns one status per attendee,
+    in order: REGISTERED or WAITLISTED (seats go out in list order),
+    DUPLICATE (already registered, or repeated earlier in the list) or
+    NOT_FOUND.
+    """
+    if not attendees:
+        return []
+    event_ids = sorted({event_id for event_id, _, _ in attendees})
+    seats = lock_seats(cur, event_ids)
+
+    emails = sorted({email for _, _, email in attendees})
+    taken = db.storage.registrations.existing(cur, event_ids, emails)
+    user_ids = db.storage.users.ids_by_email(cur, emails)
+
+    statuses = []
+    rows = []
+    for event_id, name, email in attendees:
+        key = (event_id, email.lower())
+        if event_id not in seats:
+            statuses.append(NOT_FOUND)
+            continue
+        if key in taken:
+            statuses.append(DUPLICATE)
+            continue
+        taken.add(key)
+        free = seats[event_id]
+        if free is None or free > 0:
+            status = REGISTERED
+            if free is not None:
+                seats[event_id] = free - 1
+        else:
+            status = WAITLISTED
+        statuses.append(status)
+        rows.append((event_id, user_ids.get(email.lower()), name, email, status))
+
+    if rows:
+        db.storage.registrations.insert_many(cur, rows)
+    return statuses
+
+
+def promote_waitlist(cur, event_id):
+    """Move waitlisted attendees into seats freed by a capacity change.
+
+    Runs in the caller's transaction; returns the number promoted.
+    """
+    event = db.storage.events.get(cur, event_id, for_update=True)
+    if not event:
+        return 0
+    capacity = event[5]
+    if capacity is None:
+        return db.storage.registrations.promote(cur, event_id)
+
+    free = capacity - db.storage.registrations.registered_count(cur, event_id)
+    if free <= 0:
+        return 0
+    # Oldest waitlist entries first
+    return db.storage.registrations.promote(cur, event_id, free)
+
+
+def link_users(connection, batch_size=5000, registrations=None):
+    """Set user_id on registrations whose email matches a user account.
+
+    Walks the table in primary-key ranges and commits after each range, so a
+    large backfill never holds long locks. Returns the number of rows linked.
+    Scripts without an app pass their backend's RegistrationRepository.
+    """
+    registrations = registrations or db.storage.registrations
+    cur = connection.cursor()
+    try:
+        last_id = registrations.max_id(cur)
+        linked = 0
+        for start in range(1, last_id + 1, batch_size):
+            linked += registrations.link_users(cur, start, start + batch_size - 1)
+            connection.commit()
+        return linked
+    finally:
+        cur.close()
@@ -0,0 +1,204 @@
+"""Asynchronous "registration rush" serving mode.
+
+An ASGI application that keeps every in-flight request as a cheap coroutine
+on one event loop and only hands blocking work to a bounded thread pool
+(RUSH_WORKERS threads, by default the DB pool size), so one process can hold
+thousands of concurrent sign-ups while the database sees a steady number of
+connections:
+
+* POST /register_event/<id> skips Flask's routing and view dispatch: one
+  pool thread runs the app's request hooks (the MAX_CONCURRENT_REQUESTS cap,
+  the /metrics timings, saving the session), the route's rate limits and the
+  registration INSERT under a request context, and the redirect is written
+  back from the event loop. With REGISTRATION_QUEUE set the request only
+  enqueues a ticket.
+* Every other route, including /dashboard, runs the regular Flask app on the
+  same thread pool through a small WSGI bridge.
+
+Run it with any ASGI server, e.g.:
+
+    uvicorn rush:asgi_app --host 0.0.0.0 --port 8000
+
+The regular `python app.py` / WSGI deployment is unaffected.
+"""
+import asyncio
+import io
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import flash, redirect, session, url_for
+
+import db
+import ratelimit
+import registrations as registration_service
+from app import (app as flask_app, REGISTER_EVENT_LIMITS, REGISTRATION_MESSAGES,
+                 queued_registration_message, rate_limiter, record_registration, registration_queue)
+
+REGISTER_PATH = re.compile(r'^/register_event/(\d+)$')
+
+
+async def read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body.extend(message.get('body', b''))
+        if not message.get('more_body'):
+            return bytes(body)
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a PEP 3333 WSGI environ."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            key = 'CONTENT_TYPE'
+        elif name == 'CONTENT_LENGTH':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = f'HTTP_{name}'
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class RushApp:
+    """ASGI front for the Flask app; see the module docstring."""
+
+    def __init__(self, app, max_workers=None):
+        self.app = app
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or app.config['DB_POOL_SIZE'],
+            thread_name_prefix='rush'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        match = REGISTER_PATH.match(scope['path'])
+        if match and scope['method'] == 'POST':
+            await self.register_event(scope, receive, send, int(match.group(1)))
+        else:
+            await self.call_wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def run_blocking(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def _register(self, event_id, name, email):
+        if registration_queue:
+            return queued_registration_message(registration_queue.enqueue(event_id, name, email))
+        with db.pool.connection() as connection:
+            status = registration_service.register_attendee(connection, event_id, name, email)
+        record_registration(status)
+        return REGISTRATION_MESSAGES[status]
+
+    def _rate_limited(self):
+        """The 429 for a sign-up over REGISTER_EVENT_LIMITS, or None."""
+        if not rate_limiter.enabled:
+            return None
+        wait = rate_limiter.check(REGISTER_EVENT_LIMITS)
+        return ratelimit.too_many_requests(wait) if wait else None
+
+    def _register_response(self, event_id):
+        if 'email' not in session:
+            # Same outcome as the sync route, which cannot register anonymous users
+            return redirect(url_for('login'))
+        limited = self._rate_limited()
+        if limited:
+            return limited
+        try:
+            message, category = self._register(event_id, session.get('name'), session['email'])
+        except Exception as e:
+            message, category = f"Error: {str(e)}", "danger"
+        flash(message, category)
+        return redirect(url_for('user_dashboard'))
+
+    def serve_registration(self, environ, event_id):
+        """The sign-up response, built through the app's request hooks (runs on the pool).
+
+        before_request hooks admit the request and start its metrics,
+        after_request hooks record them and save the session, and leaving
+        the context frees the admission slot.
+        """
+        with self.app.request_context(environ):
+            response = self.app.preprocess_request()
+            if response is None:
+                response = self._register_response(event_id)
+            return self.app.process_response(self.app.make_response(response))
+
+    async def register_event(self, scope, receive, send, event_id):
+        body = await read_body(receive)
+        response = await self.run_blocking(self.serve_registration, build_environ(scope, body), event_id)
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in response.headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def call_wsgi(self, scope, receive, send):
+        body = await read_body(receive)
+        environ = build_environ(scope, body)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        def first_chunk():
+            iterable = self.app(environ, start_response)
+            iterator = iter(iterable)
+            return iterable, iterator, next(iterator, None)
+
+        iterable, iterator, chunk = await self.run_blocking(first_chunk)
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'],
+                        'headers': started['headers']})
+            if chunk is None:
+                await send({'type': 'http.response.body', 'body': b''})
+            # Streamed responses (exports) are relayed chunk by chunk
+            while chunk is not None:
+                next_chunk = await self.run_blocking(next, iterator, None)
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': next_chunk is not None})
+                chunk = next_chunk
+        finally:
+            if hasattr(iterable, 'close'):
+                await self.run_blocking(iterable.close)
+
+
+asgi_app = RushApp(flask_app, int(os.getenv('RUSH_WORKERS', 0)) or None)
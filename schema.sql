@@ -9,7 +9,11 @@ CREATE TABLE users (
     email VARCHAR(50) NOT NULL UNIQUE,
     password VARCHAR(255) NOT NULL,
     semester INT,
-    year INT
+    year INT,
+    -- /users semester and year filters, keyset paginated on id
+    INDEX idx_users_semester_id (semester, id),
+    INDEX idx_users_year_id (year, id),
+    FULLTEXT INDEX ft_users_name_email (name, email)
 );
 
 CREATE TABLE events (
@@ -17,15 +21,130 @@ CREATE TABLE events (
     name VARCHAR(100) NOT NULL,
     date DATE NOT NULL,
     time TIME NOT NULL,
-    location VARCHAR(150)
+    location VARCHAR(150),
+    capacity INT NULL,  -- NULL means unlimited
+    -- Keyset pagination and filtering for the /admin and /dashboard listings
+    INDEX idx_events_date_time_id (date, time, id),
+    INDEX idx_events_location_date (location, date, time, id),
+    -- /search
+    FULLTEXT INDEX ft_events_name_location (name, location)
 );
 
 CREATE TABLE registrations (
     id INT AUTO_INCREMENT PRIMARY KEY,
     event_id INT NOT NULL,
+    user_id INT NULL,  -- the attendee's account, if they have one
     name VARCHAR(100) NOT NULL,
     email VARCHAR(100) NOT NULL,
+    status ENUM('registered', 'waitlisted') NOT NULL DEFAULT 'registered',
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE,
+    CONSTRAINT fk_registrations_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
+    -- One registration per attendee per event, enforced by the database
+    UNIQUE KEY uq_registrations_event_email (event_id, email),
+    -- Counting taken seats is an index-only range scan
+    INDEX idx_registrations_event_status (event_id, status),
+    -- "My registrations" lookups
+    INDEX idx_registrations_user_event (user_id, event_id),
+    -- Rollup compaction reads the registrations created since its last run
+    INDEX idx_registrations_created_at (created_at),
+    FULLTEXT INDEX ft_registrations_name_email (name, email)
+);
+
+-- Registration counts per event, kept current by the triggers below so the
+-- listings never count registration rows. This is a separate table rather
+-- than columns on events: the registration INSERT ... SELECT reads events,
+-- and MySQL does not let a trigger write a table its statement reads (1442).
+CREATE TABLE event_registration_counts (
+    event_id INT PRIMARY KEY,
+    registered INT NOT NULL DEFAULT 0,
+    waitlisted INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+);
+
+DELIMITER //
+CREATE TRIGGER trg_registrations_count_insert AFTER INSERT ON registrations
+FOR EACH ROW
+BEGIN
+    INSERT INTO event_registration_counts (event_id, registered, waitlisted)
+    VALUES (NEW.event_id, NEW.status = 'registered', NEW.status = 'waitlisted')
+    ON DUPLICATE KEY UPDATE
+        registered = registered + (NEW.status = 'registered'),
+        waitlisted = waitlisted + (NEW.status = 'waitlisted');
+END//
+
+CREATE TRIGGER trg_registrations_count_delete AFTER DELETE ON registrations
+FOR EACH ROW
+BEGIN
+    UPDATE event_registration_counts
+    SET registered = registered - (OLD.status = 'registered'),
+        waitlisted = waitlisted - (OLD.status = 'waitlisted')
+    WHERE event_id = OLD.event_id;
+END//
+
+CREATE TRIGGER trg_registrations_count_update AFTER UPDATE ON registrations
+FOR EACH ROW
+BEGIN
+    IF OLD.event_id <> NEW.event_id OR OLD.status <> NEW.status THEN
+        UPDATE event_registration_counts
+        SET registered = registered - (OLD.status = 'registered'),
+            waitlisted = waitlisted - (OLD.status = 'waitlisted')
+        WHERE event_id = OLD.event_id;
+        INSERT INTO event_registration_counts (event_id, registered, waitlisted)
+        VALUES (NEW.event_id, NEW.status = 'registered', NEW.status = 'waitlisted')
+        ON DUPLICATE KEY UPDATE
+            registered = registered + (NEW.status = 'registered'),
+            waitlisted = waitlisted + (NEW.status = 'waitlisted');
+    END IF;
+END//
+DELIMITER ;
+
+-- Sign-ups per hour and per day, kept by analytics.py so /admin/analytics
+-- never scans registrations. semester and year are the attendee's, 0 for
+-- attendees without an account.
+CREATE TABLE registration_rollup_hourly (
+    bucket DATETIME NOT NULL,  -- start of the hour
+    event_id INT NOT NULL,
+    semester INT NOT NULL DEFAULT 0,
+    year INT NOT NULL DEFAULT 0,
+    signups INT NOT NULL,
+    PRIMARY KEY (bucket, event_id, semester, year),
+    INDEX idx_rollup_hourly_event (event_id, bucket),
     FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
 );
 
+CREATE TABLE registration_rollup_daily (
+    bucket DATE NOT NULL,
+    event_id INT NOT NULL,
+    semester INT NOT NULL DEFAULT 0,
+    year INT NOT NULL DEFAULT 0,
+    signups INT NOT NULL,
+    PRIMARY KEY (bucket, event_id, semester, year),
+    INDEX idx_rollup_daily_event (event_id, bucket),
+    FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+);
+
+-- When the rollups were last compacted; the row is also the compaction lock
+CREATE TABLE rollup_state (
+    name VARCHAR(50) PRIMARY KEY,
+    compacted_at DATETIME NULL
+);
+
+INSERT INTO rollup_state (name) VALUES ('registrations');
+
+-- Migrations already included above; `python migrate.py` applies later ones
+CREATE TABLE schema_migrations (
+    version VARCHAR(20) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
 
+INSERT INTO schema_migrations (version, name) VALUES
+    ('001', 'event_listing_indexes'),
+    ('002', 'event_capacity_and_registration_status'),
+    ('003', 'event_registration_counts'),
+    ('004', 'registrations_user_id'),
+    ('005', 'link_registrations_to_users'),
+    ('006', 'search_fulltext_indexes'),
+    ('007', 'users_filter_indexes'),
+    ('008', 'registration_analytics');
@@ -0,0 +1,175 @@
+-- Schema for DB_BACKEND=sqlite, the SQLite counterpart of schema.sql.
+-- storage.py runs it, in one transaction, on a database whose user_version
+-- is older than the one set at the end (after upgrading the tables of an
+-- older file). Every statement is idempotent, so it is safe to run twice.
+-- Emails compare case-insensitively, as they do under MySQL's collation.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    registration_number TEXT NOT NULL UNIQUE,
+    name TEXT,
+    email TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    password TEXT NOT NULL,
+    semester INTEGER,
+    year INTEGER
+);
+-- /users semester and year filters, keyset paginated on id
+CREATE INDEX IF NOT EXISTS idx_users_semester_id ON users (semester, id);
+CREATE INDEX IF NOT EXISTS idx_users_year_id ON users (year, id);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    date TEXT NOT NULL,      -- YYYY-MM-DD
+    time TEXT NOT NULL,      -- HH:MM:SS
+    location TEXT,
+    capacity INTEGER NULL    -- NULL means unlimited
+);
+-- Keyset pagination and filtering for the /admin and /dashboard listings
+CREATE INDEX IF NOT EXISTS idx_events_date_time_id ON events (date, time, id);
+CREATE INDEX IF NOT EXISTS idx_events_location_date ON events (location, date, time, id);
+
+CREATE TABLE IF NOT EXISTS registrations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+    user_id INTEGER NULL REFERENCES users(id) ON DELETE SET NULL,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL COLLATE NOCASE,
+    status TEXT NOT NULL DEFAULT 'registered' CHECK (status IN ('registered', 'waitlisted')),
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP   -- UTC, YYYY-MM-DD HH:MM:SS
+);
+-- One registration per attendee per event, enforced by the database
+CREATE UNIQUE INDEX IF NOT EXISTS uq_registrations_event_email ON registrations (event_id, email);
+-- Counting taken seats is an index-only range scan
+CREATE INDEX IF NOT EXISTS idx_registrations_event_status ON registrations (event_id, status);
+-- "My registrations" lookups
+CREATE INDEX IF NOT EXISTS idx_registrations_user_event ON registrations (user_id, event_id);
+-- Rollup compaction reads the registrations created since its last run
+CREATE INDEX IF NOT EXISTS idx_registrations_created_at ON registrations (created_at);
+
+-- Registration counts per event, kept current by the triggers below
+CREATE TABLE IF NOT EXISTS event_registration_counts (
+    event_id INTEGER PRIMARY KEY REFERENCES events(id) ON DELETE CASCADE,
+    registered INTEGER NOT NULL DEFAULT 0,
+    waitlisted INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_registrations_count_insert AFTER INSERT ON registrations
+BEGIN
+    INSERT INTO event_registration_counts (event_id, registered, waitlisted)
+    VALUES (NEW.event_id, NEW.status = 'registered', NEW.status = 'waitlisted')
+    ON CONFLICT (event_id) DO UPDATE SET
+        registered = registered + (NEW.status = 'registered'),
+        waitlisted = waitlisted + (NEW.status = 'waitlisted');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registrations_count_delete AFTER DELETE ON registrations
+BEGIN
+    UPDATE event_registration_counts
+    SET registered = registered - (OLD.status = 'registered'),
+        waitlisted = waitlisted - (OLD.status = 'waitlisted')
+    WHERE event_id = OLD.event_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registrations_count_update AFTER UPDATE OF event_id, status ON registrations
+WHEN OLD.event_id <> NEW.event_id OR OLD.status <> NEW.status
+BEGIN
+    UPDATE event_registration_counts
+    SET registered = registered - (OLD.status = 'registered'),
+        waitlisted = waitlisted - (OLD.status = 'waitlisted')
+    WHERE event_id = OLD.event_id;
+    INSERT INTO event_registration_counts (event_id, registered, waitlisted)
+    VALUES (NEW.event_id, NEW.status = 'registered', NEW.status = 'waitlisted')
+    ON CONFLICT (event_id) DO UPDATE SET
+        registered = registered + (NEW.status = 'registered'),
+        waitlisted = waitlisted + (NEW.status = 'waitlisted');
+END;
+
+-- /search: FTS5 indexes over the searched columns, the counterpart of the
+-- FULLTEXT indexes in schema.sql. They are external-content tables, so the
+-- text is stored once, in the base table, and the triggers keep the index in
+-- step. The default unicode61 tokenizer splits emails at "@" and ".".
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(name, location, content='events', content_rowid='id');
+
+CREATE TRIGGER IF NOT EXISTS trg_events_fts_insert AFTER INSERT ON events
+BEGIN
+    INSERT INTO events_fts (rowid, name, location) VALUES (NEW.id, NEW.name, NEW.location);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_events_fts_delete AFTER DELETE ON events
+BEGIN
+    INSERT INTO events_fts (events_fts, rowid, name, location) VALUES ('delete', OLD.id, OLD.name, OLD.location);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_events_fts_update AFTER UPDATE OF name, location ON events
+BEGIN
+    INSERT INTO events_fts (events_fts, rowid, name, location) VALUES ('delete', OLD.id, OLD.name, OLD.location);
+    INSERT INTO events_fts (rowid, name, location) VALUES (NEW.id, NEW.name, NEW.location);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS registrations_fts USING fts5(name, email, content='registrations', content_rowid='id');
+
+CREATE TRIGGER IF NOT EXISTS trg_registrations_fts_insert AFTER INSERT ON registrations
+BEGIN
+    INSERT INTO registrations_fts (rowid, name, email) VALUES (NEW.id, NEW.name, NEW.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registrations_fts_delete AFTER DELETE ON registrations
+BEGIN
+    INSERT INTO registrations_fts (registrations_fts, rowid, name, email) VALUES ('delete', OLD.id, OLD.name, OLD.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_registrations_fts_update AFTER UPDATE OF name, email ON registrations
+BEGIN
+    INSERT INTO registrations_fts (registrations_fts, rowid, name, email) VALUES ('delete', OLD.id, OLD.name, OLD.email);
+    INSERT INTO registrations_fts (rowid, name, email) VALUES (NEW.id, NEW.name, NEW.email);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(name, email, content='users', content_rowid='id');
+
+CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users
+BEGIN
+    INSERT INTO users_fts (rowid, name, email) VALUES (NEW.id, NEW.name, NEW.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users
+BEGIN
+    INSERT INTO users_fts (users_fts, rowid, name, email) VALUES ('delete', OLD.id, OLD.name, OLD.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_fts_update AFTER UPDATE OF name, email ON users
+BEGIN
+    INSERT INTO users_fts (users_fts, rowid, name, email) VALUES ('delete', OLD.id, OLD.name, OLD.email);
+    INSERT INTO users_fts (rowid, name, email) VALUES (NEW.id, NEW.name, NEW.email);
+END;
+
+-- Sign-ups per hour and per day, kept by analytics.py for /admin/analytics.
+-- semester and year are the attendee's, 0 for attendees without an account.
+CREATE TABLE IF NOT EXISTS registration_rollup_hourly (
+    bucket TEXT NOT NULL,    -- YYYY-MM-DD HH:00:00
+    event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+    semester INTEGER NOT NULL DEFAULT 0,
+    year INTEGER NOT NULL DEFAULT 0,
+    signups INTEGER NOT NULL,
+    PRIMARY KEY (bucket, event_id, semester, year)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_hourly_event ON registration_rollup_hourly (event_id, bucket);
+
+CREATE TABLE IF NOT EXISTS registration_rollup_daily (
+    bucket TEXT NOT NULL,    -- YYYY-MM-DD
+    event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+    semester INTEGER NOT NULL DEFAULT 0,
+    year INTEGER NOT NULL DEFAULT 0,
+    signups INTEGER NOT NULL,
+    PRIMARY KEY (bucket, event_id, semester, year)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_daily_event ON registration_rollup_daily (event_id, bucket);
+
+-- When the rollups were last compacted; the row is also the compaction lock
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name TEXT PRIMARY KEY,
+    compacted_at TEXT NULL
+);
+INSERT OR IGNORE INTO rollup_state (name) VALUES ('registrations');
+
+PRAGMA user_version = 9;
@@ -0,0 +1,77 @@
+"""Full-text search over events, registrations and users.
+
+Backed by the FULLTEXT indexes from migrations/006_search_fulltext_indexes.sql
+and queried in boolean mode, so every word must match and each word also
+matches as a prefix ("ali exam" finds alice@example.com). Results are ordered
+by relevance and paged with LIMIT/OFFSET; deep pages are capped because a
+search that needs them should be narrowed instead.
+
+InnoDB only indexes words of at least innodb_ft_min_token_size characters
+(3 by default), so shorter words are dropped from the query. It also leaves
+out its default stopwords (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD,
+copied in STOPWORDS), and a required stopword would match nothing, so those
+are dropped too: "alice example com" searches for "alice example". Email
+addresses are split into words at "@" and ".".
+
+With DB_BACKEND=sqlite the FTS5 indexes from schema_sqlite.sql play the
+same part: every word is a prefix query and results are ranked by bm25()
+(see storage.SQLiteFullTextSearch). The word-length limit is kept, so both
+backends accept the same searches.
+
+The queries themselves live in the repositories (storage.FullTextSearch);
+this module picks the searchable words and pages through the results.
+"""
+import re
+
+import db
+
+MIN_TERM_LENGTH = 3
+# InnoDB's default full-text stopword list
+STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what',
+    'when', 'where', 'who', 'will', 'with', 'und', 'www',
+))
+MAX_TERMS = 8
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE = 50
+
+# kind (a db.storage repository) -> column names for the JSON API
+KINDS = {
+    'events': ('id', 'name', 'date', 'time', 'location', 'capacity'),
+    'registrations': ('id', 'event_id', 'event_name', 'name', 'email', 'status'),
+    'users': ('id', 'registration_number', 'name', 'email', 'semester', 'year'),
+}
+
+
+def terms(text):
+    """The searchable words in `text`, lower-cased and de-duplicated, without STOPWORDS."""
+    found = []
+    for word in re.findall(r'\w+', (text or '').lower()):
+        if len(word) >= MIN_TERM_LENGTH and word not in STOPWORDS and word not in found:
+            found.append(word)
+    return found[:MAX_TERMS]
+
+
+def search(cur, kind, text, page=1, limit=SEARCH_PAGE_SIZE):
+    """One page of `kind` rows matching `text`; returns (rows, has_next).
+
+    Raises ValueError for an unknown kind. Text without a searchable word
+    returns no rows rather than scanning the table.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown search kind: {kind}")
+    words = terms(text)
+    if not words:
+        return [], False
+    page = max(1, min(page, MAX_SEARCH_PAGE))
+    rows = getattr(db.storage, kind).search(cur, words, limit + 1, (page - 1) * limit)
+    has_next = len(rows) > limit and page < MAX_SEARCH_PAGE
+    return rows[:limit], has_next
+
+
+def as_dicts(kind, rows):
+    """Rows as JSON-ready dicts (dates and times as strings)."""
+    names = KINDS[kind]
+    return [{name: value if value is None or isinstance(value, (int, str)) else str(value)
+             for name, value in zip(names, row)} for row in rows]
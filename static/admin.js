@@ -0,0 +1,19 @@
+// Fill the edit modal from the data-* attributes of the clicked edit button
+function padTime(value) {
+    // "9:00:00" -> "09:00", as <input type="time"> expects
+    var parts = value.split(':');
+    return parts.length < 2 ? '' : parts[0].padStart(2, '0') + ':' + parts[1];
+}
+
+document.addEventListener('click', function (e) {
+    var button = e.target.closest('[data-edit-event]');
+    if (!button) {
+        return;
+    }
+    document.getElementById('editEventId').value = button.dataset.id;
+    document.getElementById('editEventName').value = button.dataset.name;
+    document.getElementById('editEventDate').value = button.dataset.date;
+    document.getElementById('editEventTime').value = padTime(button.dataset.time);
+    document.getElementById('editEventLocation').value = button.dataset.location;
+    document.getElementById('editEventCapacity').value = button.dataset.capacity;
+});
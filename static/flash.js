@@ -0,0 +1,9 @@
+// Fade out flash messages marked data-autodismiss after five seconds
+document.querySelectorAll('.alert[data-autodismiss]').forEach(function (alert) {
+    setTimeout(function () {
+        alert.classList.remove('show');
+        setTimeout(function () {
+            alert.remove();
+        }, 500);
+    }, 5000);
+});
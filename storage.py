@@ -0,0 +1,930 @@
+"""Storage backends and the repositories that hold the app's SQL.
+
+DB_BACKEND chooses where events, registrations and users live:
+
+* mysql (default): the MySQL server named by MYSQL_*. The schema comes from
+  schema.sql and migrate.py.
+* sqlite: an embedded database file (SQLITE_PATH, default
+  event_management.db next to the app), created from schema_sqlite.sql on
+  first use and upgraded in place from older versions. There is no server
+  and no network round trip, which suits small deployments, CI and
+  benchmarks. Connections run in WAL mode, so readers never block the
+  writer. They also use synchronous=NORMAL, a 64 MB page cache,
+  memory-mapped reads and enforced foreign keys. sqlite3 keeps the compiled
+  form of recent statements per connection, so the repositories' fixed SQL
+  strings are prepared once per pooled connection.
+
+All queries live in the repositories: db.storage.events, .registrations,
+.users and .analytics. Their methods take an open cursor from db.cursor() or
+db.transaction(), so callers still decide what runs in one transaction.
+Statements use %s placeholders with both backends. The base classes hold
+the MySQL statements, and the SQLite subclasses override only the ones whose
+dialect differs.
+
+SQLite allows one writer at a time instead of row locks. Where MySQL reads
+rows FOR UPDATE, the SQLite repositories start the transaction with BEGIN
+IMMEDIATE, which takes the write lock before the read. Dates and times come
+back from SQLite as ISO text ('2025-03-01', '09:30:00') rather than date and
+timedelta objects. Both render the same.
+"""
+import os
+import re
+import sqlite3
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SQLITE_PATH = os.path.join(BASE_DIR, 'event_management.db')
+SQLITE_SCHEMA = os.path.join(BASE_DIR, 'schema_sqlite.sql')
+# The last migration schema_sqlite.sql includes (PRAGMA user_version)
+SQLITE_SCHEMA_VERSION = 9
+
+# Changes to existing tables in database files older than a version, applied
+# before schema_sqlite.sql (which adds new tables, indexes and triggers).
+# 8: registrations.created_at. SQLite cannot add a column defaulting to
+# CURRENT_TIMESTAMP, so the table is rebuilt; dropping it also drops its
+# indexes and triggers, which the schema script then recreates.
+# 9: FTS5 search indexes, filled from the existing rows; the schema script
+# adds the triggers that keep them current.
+SQLITE_UPGRADES = (
+    (8, (
+        """CREATE TABLE registrations_v8 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+            user_id INTEGER NULL REFERENCES users(id) ON DELETE SET NULL,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL COLLATE NOCASE,
+            status TEXT NOT NULL DEFAULT 'registered' CHECK (status IN ('registered', 'waitlisted')),
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "INSERT INTO registrations_v8 (id, event_id, user_id, name, email, status) "
+        "SELECT id, event_id, user_id, name, email, status FROM registrations",
+        # Keep AUTOINCREMENT from reusing the ids of deleted registrations
+        "UPDATE sqlite_sequence SET seq = (SELECT seq FROM sqlite_sequence WHERE name = 'registrations') "
+        "WHERE name = 'registrations_v8'",
+        "DROP TABLE registrations",
+        "ALTER TABLE registrations_v8 RENAME TO registrations",
+    )),
+    (9, (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(name, location, content='events', content_rowid='id')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS registrations_fts USING fts5(name, email, content='registrations', content_rowid='id')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(name, email, content='users', content_rowid='id')",
+        "INSERT INTO events_fts (events_fts) VALUES ('rebuild')",
+        "INSERT INTO registrations_fts (registrations_fts) VALUES ('rebuild')",
+        "INSERT INTO users_fts (users_fts) VALUES ('rebuild')",
+    )),
+)
+
+# Ways to find the logged-in user's registrations (see app.current_attendee)
+ATTENDEE_COLUMNS = ('user_id', 'email')
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def keyset_after(after, table=''):
+    """SQL condition and params for rows sorting after the (date, time, id) key `after`."""
+    date, time, event_id = after
+    t = f"{table}." if table else ''
+    # The leading `date >= %s` lets MySQL turn the OR chain into a range scan
+    return (
+        f"{t}date >= %s AND ({t}date > %s OR ({t}date = %s AND ({t}time > %s OR ({t}time = %s AND {t}id > %s))))",
+        [date, date, date, time, time, event_id]
+    )
+
+
+def attendee_column(column):
+    if column not in ATTENDEE_COLUMNS:
+        raise ValueError(f"Cannot look up registrations by {column}")
+    return column
+
+
+class FullTextSearch:
+    """search() for a repository: SEARCH_SELECT rows matching on SEARCH_COLUMNS.
+
+    With MySQL the columns carry a FULLTEXT index, queried in boolean mode.
+    SEARCH_KEY orders rows that rank the same.
+    """
+
+    SEARCH_SELECT = None
+    SEARCH_COLUMNS = None
+    SEARCH_KEY = None
+
+    def full_text(self, words):
+        """(join, condition, ranking, params) requiring every word as a prefix."""
+        query = ' '.join(f"+{word}*" for word in words)
+        match = f"MATCH({self.SEARCH_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)"
+        return "", match, f"{match} DESC", [query, query]
+
+    def search(self, cur, words, limit, offset=0):
+        """Up to `limit` rows matching every word, most relevant first, after skipping `offset`."""
+        join, condition, ranking, params = self.full_text(words)
+        where = f"WHERE {condition}" if condition else ""
+        cur.execute(f"""
+            {self.SEARCH_SELECT}
+            {join}
+            {where}
+            ORDER BY {ranking}, {self.SEARCH_KEY}
+            LIMIT %s OFFSET %s
+        """, params + [limit, offset])
+        return list(cur.fetchall())
+
+
+class EventRepository(FullTextSearch):
+    """Event rows: (id, name, date, time, location, capacity)."""
+
+    COLUMNS = "id, name, date, time, location, capacity"
+    FIELDS = ('name', 'date', 'time', 'location', 'capacity')
+    FOR_UPDATE = " FOR UPDATE"
+    SEARCH_SELECT = "SELECT e.id, e.name, e.date, e.time, e.location, e.capacity FROM events e"
+    SEARCH_COLUMNS = "e.name, e.location"
+    SEARCH_KEY = "e.id"
+
+    def lock(self, cur):
+        """Called before reading rows the transaction goes on to write."""
+
+    def time_value(self, time):
+        return time
+
+    def get(self, cur, event_id, for_update=False):
+        """One event row or None; for_update locks it until the transaction ends."""
+        if for_update:
+            self.lock(cur)
+        lock = self.FOR_UPDATE if for_update else ''
+        cur.execute(f"SELECT {self.COLUMNS} FROM events WHERE id = %s{lock}", (event_id,))
+        return cur.fetchone()
+
+    def exists(self, cur, event_id):
+        cur.execute("SELECT 1 FROM events WHERE id = %s", (event_id,))
+        return cur.fetchone() is not None
+
+    def ids(self, cur):
+        """Every event id, in order."""
+        cur.execute("SELECT id FROM events ORDER BY id")
+        return [row[0] for row in cur.fetchall()]
+
+    def export(self, cur):
+        """Start reading every event in (date, time, id) order; fetch the rows from `cur`."""
+        cur.execute(f"SELECT {self.COLUMNS} FROM events ORDER BY date, time, id")
+
+    def page(self, cur, filters, after=None, limit=50):
+        """Up to `limit` events ordered by (date, time, id).
+
+        Keyset pagination: instead of an OFFSET, the page starts right after
+        the sort key in `after`, so every page is a bounded range scan on the
+        idx_events_date_time_id index.
+        """
+        clauses = []
+        params = []
+
+        if 'date_from' in filters:
+            clauses.append("date >= %s")
+            params.append(filters['date_from'])
+        if 'date_to' in filters:
+            clauses.append("date <= %s")
+            params.append(filters['date_to'])
+        if 'location' in filters:
+            # Prefix match so the (location, date, time, id) index can be used
+            escaped = re.sub(r'([\\%_])', r'\\\1', filters['location'])
+            clauses.append("location LIKE %s")
+            params.append(escaped + '%')
+        if after:
+            clause, clause_params = keyset_after(after)
+            clauses.append(clause)
+            params.extend(clause_params)
+
+        query = f"SELECT {self.COLUMNS} FROM events"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY date, time, id LIMIT %s"
+        params.append(limit)
+
+        cur.execute(query, params)
+        return list(cur.fetchall())
+
+    def counts(self, cur, event_ids):
+        """{event_id: (registered, waitlisted)} from the trigger-maintained counts table."""
+        if not event_ids:
+            return {}
+        cur.execute(
+            f"SELECT event_id, registered, waitlisted FROM event_registration_counts "
+            f"WHERE event_id IN ({placeholders(event_ids)})",
+            list(event_ids)
+        )
+        return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+
+    def lock_capacities(self, cur, event_ids):
+        """Lock events and return {event_id: capacity}; unknown ids are left out."""
+        self.lock(cur)
+        cur.execute(
+            f"SELECT id, capacity FROM events WHERE id IN ({placeholders(event_ids)}){self.FOR_UPDATE}",
+            list(event_ids)
+        )
+        return dict(cur.fetchall())
+
+    def create(self, cur, name, date, time, location, capacity):
+        """Insert an event and return its id."""
+        cur.execute(
+            "INSERT INTO events (name, date, time, location, capacity) VALUES (%s, %s, %s, %s, %s)",
+            (name, date, self.time_value(time), location, capacity)
+        )
+        return cur.lastrowid
+
+    def insert_many(self, cur, rows):
+        """Insert (name, date, time, location, capacity) rows with one executemany."""
+        cur.executemany(
+            "INSERT INTO events (name, date, time, location, capacity) VALUES (%s, %s, %s, %s, %s)",
+            [(name, date, self.time_value(time), location, capacity)
+             for name, date, time, location, capacity in rows]
+        )
+
+    def update(self, cur, event_id, **fields):
+        """Set the given FIELDS of an event; returns the number of rows changed."""
+        unknown = set(fields) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown event field(s): {', '.join(sorted(unknown))}")
+        if 'time' in fields:
+            fields['time'] = self.time_value(fields['time'])
+        names = [name for name in self.FIELDS if name in fields]
+        cur.execute(
+            f"UPDATE events SET {', '.join(f'{name}=%s' for name in names)} WHERE id=%s",
+            [fields[name] for name in names] + [event_id]
+        )
+        return cur.rowcount
+
+    def delete(self, cur, event_ids):
+        """Delete events; their registrations go with them (ON DELETE CASCADE)."""
+        cur.execute(f"DELETE FROM events WHERE id IN ({placeholders(event_ids)})", list(event_ids))
+        return cur.rowcount
+
+
+class RegistrationRepository(FullTextSearch):
+    """Registration rows and the seat-checked inserts behind registrations.py."""
+
+    INSERT_IGNORE = "INSERT IGNORE"
+    FOR_UPDATE = " FOR UPDATE"
+    SEARCH_SELECT = ("SELECT r.id, r.event_id, e.name, r.name, r.email, r.status "
+                     "FROM registrations r JOIN events e ON e.id = r.event_id")
+    SEARCH_COLUMNS = "r.name, r.email"
+    SEARCH_KEY = "r.id"
+
+    # Locks the event row, counts the seats already taken and inserts only if
+    # one is free; the UNIQUE (event_id, email) index rejects duplicates
+    REGISTER_SQL = """
+        {insert} INTO registrations (event_id, user_id, name, email, status)
+        SELECT e.id, (SELECT u.id FROM users u WHERE u.email = %s), %s, %s, 'registered'
+        FROM events e
+        CROSS JOIN (
+            SELECT COUNT(*) AS taken FROM registrations
+            WHERE event_id = %s AND status = 'registered'
+        ) AS seats
+        WHERE e.id = %s AND (e.capacity IS NULL OR seats.taken < e.capacity)
+        {for_update}
+    """
+
+    WAITLIST_SQL = """
+        {insert} INTO registrations (event_id, user_id, name, email, status)
+        SELECT e.id, (SELECT u.id FROM users u WHERE u.email = %s), %s, %s, 'waitlisted'
+        FROM events e
+        WHERE e.id = %s
+    """
+
+    def lock(self, cur):
+        """Called before reading rows the transaction goes on to write."""
+
+    def register_if_free(self, cur, event_id, name, email):
+        """Insert a 'registered' row if the event has a free seat; True if inserted."""
+        self.lock(cur)
+        cur.execute(
+            self.REGISTER_SQL.format(insert=self.INSERT_IGNORE, for_update=self.FOR_UPDATE.strip()),
+            (email, name, email, event_id, event_id)
+        )
+        return cur.rowcount == 1
+
+    def waitlist(self, cur, event_id, name, email):
+        """Insert a 'waitlisted' row; False for duplicates and unknown events."""
+        cur.execute(self.WAITLIST_SQL.format(insert=self.INSERT_IGNORE), (email, name, email, event_id))
+        return cur.rowcount == 1
+
+    def taken_seats(self, cur, event_ids):
+        """{event_id: registered count}, counted from the registration rows."""
+        cur.execute(
+            f"SELECT event_id, COUNT(*) FROM registrations "
+            f"WHERE event_id IN ({placeholders(event_ids)}) AND status = 'registered' GROUP BY event_id",
+            list(event_ids)
+        )
+        return dict(cur.fetchall())
+
+    def existing(self, cur, event_ids, emails):
+        """{(event_id, lower-cased email)} of registrations among these events and emails."""
+        cur.execute(
+            f"SELECT event_id, email FROM registrations "
+            f"WHERE event_id IN ({placeholders(event_ids)}) AND email IN ({placeholders(emails)})",
+            list(event_ids) + list(emails)
+        )
+        return {(row[0], row[1].lower()) for row in cur.fetchall()}
+
+    def insert_many(self, cur, rows):
+        """Insert (event_id, user_id, name, email, status) rows with one executemany."""
+        cur.executemany(
+            "INSERT INTO registrations (event_id, user_id, name, email, status) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            rows
+        )
+
+    def insert_backdated(self, cur, rows):
+        """Insert (event_id, name, email, created_at) rows, e.g. generated past sign-ups."""
+        cur.executemany(
+            "INSERT INTO registrations (event_id, name, email, created_at) VALUES (%s, %s, %s, %s)",
+            rows
+        )
+
+    def registered_count(self, cur, event_id):
+        cur.execute(
+            "SELECT COUNT(*) FROM registrations WHERE event_id = %s AND status = 'registered'",
+            (event_id,)
+        )
+        return cur.fetchone()[0]
+
+    def promote(self, cur, event_id, limit=None):
+        """Move the oldest `limit` (or all) waitlisted attendees into seats; returns how many."""
+        if limit is None:
+            cur.execute(
+                "UPDATE registrations SET status = 'registered' WHERE event_id = %s AND status = 'waitlisted'",
+                (event_id,)
+            )
+        else:
+            cur.execute(
+                "UPDATE registrations SET status = 'registered' "
+                "WHERE event_id = %s AND status = 'waitlisted' ORDER BY id LIMIT %s",
+                (event_id, limit)
+            )
+        return cur.rowcount
+
+    def for_event(self, cur, event_id):
+        """(id, name, email, status) of every registration for an event, oldest first."""
+        cur.execute("""
+            SELECT registrations.id, registrations.name, registrations.email, registrations.status
+            FROM registrations
+            WHERE registrations.event_id = %s
+            ORDER BY registrations.id
+        """, (event_id,))
+        return cur.fetchall()
+
+    def page_for_event(self, cur, event_id, after=0, limit=50):
+        """Up to `limit` (id, event_id, user_id, name, email, status) rows with id > after."""
+        cur.execute(
+            "SELECT id, event_id, user_id, name, email, status FROM registrations "
+            "WHERE event_id = %s AND id > %s ORDER BY id LIMIT %s",
+            (event_id, after, limit)
+        )
+        return list(cur.fetchall())
+
+    def export(self, cur):
+        """Start reading every registration in (event_id, id) order; fetch the rows from `cur`."""
+        cur.execute(
+            "SELECT id, event_id, user_id, name, email, status FROM registrations ORDER BY event_id, id"
+        )
+
+    def statuses(self, cur, column, value, event_ids):
+        """{event_id: status} of one attendee's registrations among event_ids."""
+        if not event_ids:
+            return {}
+        cur.execute(
+            f"SELECT event_id, status FROM registrations "
+            f"WHERE {attendee_column(column)} = %s AND event_id IN ({placeholders(event_ids)})",
+            [value] + list(event_ids)
+        )
+        return dict(cur.fetchall())
+
+    def events_for(self, cur, column, value, after=None, limit=50):
+        """An attendee's events with their status, keyset-paginated like EventRepository.page."""
+        query = f"""
+            SELECT e.id, e.name, e.date, e.time, e.location, e.capacity, r.status
+            FROM registrations r
+            JOIN events e ON e.id = r.event_id
+            WHERE r.{attendee_column(column)} = %s
+        """
+        params = [value]
+        if after:
+            clause, clause_params = keyset_after(after, 'e')
+            query += " AND " + clause
+            params.extend(clause_params)
+        query += " ORDER BY e.date, e.time, e.id LIMIT %s"
+        params.append(limit)
+        cur.execute(query, params)
+        return list(cur.fetchall())
+
+    def max_id(self, cur):
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM registrations")
+        return cur.fetchone()[0]
+
+    def link_users(self, cur, first_id, last_id):
+        """Set user_id from the matching user's email for ids in [first_id, last_id]."""
+        cur.execute(
+            "UPDATE registrations r JOIN users u ON u.email = r.email "
+            "SET r.user_id = u.id "
+            "WHERE r.id BETWEEN %s AND %s AND r.user_id IS NULL",
+            (first_id, last_id)
+        )
+        return cur.rowcount
+
+
+class UserRepository(FullTextSearch):
+    """User accounts. Only find_for_login ever reads the password column."""
+
+    COLUMNS = "id, registration_number, name, email, semester, year"
+    LOGIN_COLUMNS = ('id', 'name', 'email', 'password')
+    FILTERS = ('semester', 'year')
+    SEARCH_SELECT = "SELECT u.id, u.registration_number, u.name, u.email, u.semester, u.year FROM users u"
+    SEARCH_COLUMNS = "u.name, u.email"
+    SEARCH_KEY = "u.id"
+    INSERT_SQL = ("INSERT INTO users (registration_number, name, email, password, semester, year) "
+                  "VALUES (%s, %s, %s, %s, %s, %s)")
+
+    def create(self, cur, registration_number, name, email, password_hash, semester=None, year=None):
+        cur.execute(self.INSERT_SQL, (registration_number, name, email, password_hash, semester, year))
+        return cur.lastrowid
+
+    def insert_many(self, cur, rows):
+        """Insert (registration_number, name, email, password hash, semester, year) rows."""
+        cur.executemany(self.INSERT_SQL, rows)
+
+    def delete_all_except(self, cur, email):
+        """Delete every account but `email`'s; returns how many went."""
+        cur.execute("DELETE FROM users WHERE email != %s", (email,))
+        return cur.rowcount
+
+    def find_for_login(self, cur, email):
+        """{'id', 'name', 'email', 'password'} for an email, or None."""
+        cur.execute(f"SELECT {', '.join(self.LOGIN_COLUMNS)} FROM users WHERE email = %s", (email,))
+        row = cur.fetchone()
+        return dict(zip(self.LOGIN_COLUMNS, row)) if row else None
+
+    def set_password(self, cur, user_id, password_hash):
+        cur.execute("UPDATE users SET password = %s WHERE id = %s", (password_hash, user_id))
+
+    def set_password_by_email(self, cur, email, password_hash):
+        cur.execute("UPDATE users SET password = %s WHERE email = %s", (password_hash, email))
+
+    def _filtered(self, filters):
+        """WHERE clauses and params for the FILTERS in `filters`; other keys are ignored."""
+        names = [name for name in self.FILTERS if name in filters]
+        return [f"{name} = %s" for name in names], [filters[name] for name in names]
+
+    def page(self, cur, filters, after=0, limit=100):
+        """Up to `limit` users with id > after, optionally filtered by FILTERS."""
+        clauses, params = self._filtered(filters)
+        if after:
+            # Keyset pagination on the primary key; served by idx_users_semester_id
+            # or idx_users_year_id when filtered
+            clauses.append("id > %s")
+            params.append(after)
+        query = f"SELECT {self.COLUMNS} FROM users"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY id LIMIT %s"
+        params.append(limit)
+        cur.execute(query, params)
+        return list(cur.fetchall())
+
+    def export(self, cur, filters=None):
+        """Start reading the roster in id order, optionally filtered by FILTERS; fetch the rows from `cur`.
+
+        Password hashes are never exported.
+        """
+        clauses, params = self._filtered(filters or {})
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        cur.execute(f"SELECT {self.COLUMNS} FROM users{where} ORDER BY id", params)
+
+    def ids_by_email(self, cur, emails):
+        """{lower-cased email: user id} for the accounts among `emails`."""
+        cur.execute(f"SELECT email, id FROM users WHERE email IN ({placeholders(emails)})", list(emails))
+        return {row[0].lower(): row[1] for row in cur.fetchall()}
+
+    def contacts_except(self, cur, email):
+        """[(email, name)] of every account but `email`'s, in id order."""
+        cur.execute("SELECT email, name FROM users WHERE email != %s ORDER BY id", (email,))
+        return list(cur.fetchall())
+
+
+class AnalyticsRepository:
+    """Sign-up rollups: registrations counted per hour and per day (see analytics.py).
+
+    Rollup rows are keyed by (bucket, event_id, semester, year). Semester and
+    year come from the attendee's account, and are 0 for attendees without one.
+    """
+
+    FOR_UPDATE = " FOR UPDATE"
+    TABLES = {'hour': 'registration_rollup_hourly', 'day': 'registration_rollup_daily'}
+    # Date arithmetic; {value} is a column or one of NOW and TODAY
+    HOUR_OF = "DATE_FORMAT({value}, '%%Y-%%m-%%d %%H:00:00')"
+    HOURS_BEFORE = "{value} - INTERVAL %s HOUR"
+    DAYS_BEFORE = "{value} - INTERVAL %s DAY"
+    NOW = "NOW()"
+    TODAY = "CURDATE()"
+
+    def lock(self, cur):
+        """Called before reading rows the transaction goes on to write."""
+
+    def compacted_at(self, cur, for_update=False):
+        """When the rollups were last brought up to date, or None.
+
+        With for_update the state row stays locked until commit, so
+        compactions running in several workers take turns.
+        """
+        if for_update:
+            self.lock(cur)
+        cur.execute(
+            "SELECT compacted_at FROM rollup_state WHERE name = 'registrations'"
+            + (self.FOR_UPDATE if for_update else "")
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def rollup_start(self, cur, overlap_hours):
+        """The hour `overlap_hours` before the newest hourly bucket (None: no rollups yet)."""
+        cur.execute(
+            f"SELECT {self.HOURS_BEFORE.format(value='MAX(bucket)')} FROM registration_rollup_hourly",
+            (overlap_hours,)
+        )
+        return cur.fetchone()[0]
+
+    def rebuild_hours(self, cur, start=None):
+        """Recount the hourly rollups from `start` (None: all); returns the rows written.
+
+        The registrations are read without locks and the counts written with
+        one executemany, so sign-ups are never blocked by a compaction.
+        """
+        where, params = ("WHERE r.created_at >= %s", [start]) if start is not None else ("", [])
+        cur.execute(f"""
+            SELECT {self.HOUR_OF.format(value='r.created_at')}, r.event_id,
+                   COALESCE(u.semester, 0), COALESCE(u.year, 0), COUNT(*)
+            FROM registrations r
+            LEFT JOIN users u ON u.id = r.user_id
+            {where}
+            GROUP BY 1, 2, 3, 4
+        """, params)
+        rows = list(cur.fetchall())
+        cur.execute(f"DELETE FROM registration_rollup_hourly {where.replace('r.created_at', 'bucket')}", params)
+        if rows:
+            cur.executemany(
+                "INSERT INTO registration_rollup_hourly (bucket, event_id, semester, year, signups) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                rows
+            )
+        return len(rows)
+
+    def rebuild_days(self, cur, start=None):
+        """Recount the daily rollups from the hourly ones, from the day of `start` on."""
+        where, params = ("WHERE bucket >= DATE(%s)", [start]) if start is not None else ("", [])
+        cur.execute(f"DELETE FROM registration_rollup_daily {where}", params)
+        cur.execute(f"""
+            INSERT INTO registration_rollup_daily (bucket, event_id, semester, year, signups)
+            SELECT DATE(bucket), event_id, semester, year, SUM(signups)
+            FROM registration_rollup_hourly
+            {where}
+            GROUP BY 1, 2, 3, 4
+        """, params)
+        return cur.rowcount
+
+    def mark_compacted(self, cur):
+        cur.execute("UPDATE rollup_state SET compacted_at = CURRENT_TIMESTAMP WHERE name = 'registrations'")
+
+    def _window(self, grain, count, event_id=None):
+        """(table, WHERE clause, params) for the last `count` hours or days."""
+        if grain == 'hour':
+            clauses = [f"r.bucket >= {self.HOUR_OF.format(value=self.HOURS_BEFORE.format(value=self.NOW))}"]
+        else:
+            clauses = [f"r.bucket >= {self.DAYS_BEFORE.format(value=self.TODAY)}"]
+        params = [count - 1]
+        if event_id is not None:
+            clauses.append("r.event_id = %s")
+            params.append(event_id)
+        return self.TABLES[grain], " WHERE " + " AND ".join(clauses), params
+
+    def timeline(self, cur, grain, count, event_id=None):
+        """[(bucket, sign-ups)] for the last `count` hours or days, oldest first."""
+        table, where, params = self._window(grain, count, event_id)
+        cur.execute(f"SELECT r.bucket, SUM(r.signups) FROM {table} r{where} GROUP BY r.bucket ORDER BY r.bucket",
+                    params)
+        return list(cur.fetchall())
+
+    def by_cohort(self, cur, grain, count, event_id=None):
+        """[(semester, year, sign-ups)] over the window, by year and semester."""
+        table, where, params = self._window(grain, count, event_id)
+        cur.execute(
+            f"SELECT r.semester, r.year, SUM(r.signups) FROM {table} r{where} "
+            f"GROUP BY r.semester, r.year ORDER BY r.year, r.semester",
+            params
+        )
+        return list(cur.fetchall())
+
+    def by_location(self, cur, grain, count, event_id=None):
+        """[(location, sign-ups)] over the window, busiest first."""
+        table, where, params = self._window(grain, count, event_id)
+        cur.execute(
+            f"SELECT e.location, SUM(r.signups) FROM {table} r JOIN events e ON e.id = r.event_id{where} "
+            f"GROUP BY e.location ORDER BY 2 DESC",
+            params
+        )
+        return list(cur.fetchall())
+
+    def by_event(self, cur, grain, count, event_id=None, limit=20):
+        """[(event_id, name, location, sign-ups)] for the `limit` busiest events in the window."""
+        table, where, params = self._window(grain, count, event_id)
+        cur.execute(
+            f"SELECT e.id, e.name, e.location, SUM(r.signups) FROM {table} r JOIN events e ON e.id = r.event_id{where} "
+            f"GROUP BY e.id, e.name, e.location ORDER BY 4 DESC, e.id LIMIT %s",
+            params + [limit]
+        )
+        return list(cur.fetchall())
+
+
+class MySQLStorage:
+    """A MySQL server (DB_BACKEND=mysql); requires the `mysqlclient` package."""
+
+    name = 'mysql'
+    # Deadlock / lock wait timeout; the transaction is safe to retry
+    RETRYABLE_ERRORS = (1213, 1205)
+
+    def __init__(self, host=None, user=None, password=None, database=None):
+        import MySQLdb
+        self._driver = MySQLdb
+        self.Error = MySQLdb.Error
+        self.connect_kwargs = {
+            'host': host or 'localhost',
+            'user': user,
+            'password': password or '',
+            'database': database,
+            'charset': 'utf8mb4',
+        }
+        self.events = EventRepository()
+        self.registrations = RegistrationRepository()
+        self.users = UserRepository()
+        self.analytics = AnalyticsRepository()
+
+    @property
+    def target(self):
+        """The database this storage reads and writes, for messages."""
+        return f"MySQL database {self.connect_kwargs['database']} on {self.connect_kwargs['host']}"
+
+    def connect(self):
+        return self._driver.connect(**self.connect_kwargs)
+
+    def is_retryable(self, error):
+        return isinstance(error, self._driver.OperationalError) and error.args[0] in self.RETRYABLE_ERRORS
+
+    def streaming_cursor(self, connection):
+        """A server-side cursor: rows are fetched lazily instead of buffered."""
+        from MySQLdb.cursors import SSCursor
+        return connection.cursor(SSCursor)
+
+    def reset_tables(self, cur, tables):
+        """Empty tables quickly, ignoring foreign keys between them."""
+        cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in tables:
+            cur.execute(f"TRUNCATE TABLE {table}")
+        cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    def prepare(self):
+        """Nothing to do: schema.sql and migrate.py manage the MySQL schema."""
+
+
+class SQLiteLocking:
+    """BEGIN IMMEDIATE in place of row locks (see the module docstring)."""
+
+    FOR_UPDATE = ""
+
+    def lock(self, cur):
+        if not cur.connection.in_transaction:
+            cur.execute("BEGIN IMMEDIATE")
+
+
+class SQLiteFullTextSearch:
+    """FTS5 in place of FULLTEXT: SEARCH_FTS_TABLE (schema_sqlite.sql) indexes SEARCH_COLUMNS."""
+
+    SEARCH_FTS_TABLE = None
+
+    def full_text(self, words):
+        # Join the matches once, ranked by bm25() (lower is more relevant)
+        table = self.SEARCH_FTS_TABLE
+        query = ' '.join(f'"{word}"*' for word in words)
+        join = (f"JOIN (SELECT rowid AS id, bm25({table}) AS score FROM {table} WHERE {table} MATCH %s) AS fts "
+                f"ON fts.id = {self.SEARCH_KEY}")
+        return join, None, "fts.score", [query]
+
+
+class SQLiteEventRepository(SQLiteLocking, SQLiteFullTextSearch, EventRepository):
+
+    SEARCH_FTS_TABLE = 'events_fts'
+
+    def time_value(self, time):
+        # Stored as HH:MM:SS text so that times sort correctly, like MySQL TIME values
+        parts = [int(part) for part in str(time).split(':')] + [0, 0]
+        return '%02d:%02d:%02d' % tuple(parts[:3])
+
+
+class SQLiteRegistrationRepository(SQLiteLocking, SQLiteFullTextSearch, RegistrationRepository):
+
+    INSERT_IGNORE = "INSERT OR IGNORE"
+    SEARCH_FTS_TABLE = 'registrations_fts'
+
+    def promote(self, cur, event_id, limit=None):
+        if limit is None:
+            return super().promote(cur, event_id)
+        # No ORDER BY/LIMIT on UPDATE in stock SQLite builds
+        cur.execute(
+            "UPDATE registrations SET status = 'registered' WHERE id IN ("
+            "SELECT id FROM registrations WHERE event_id = %s AND status = 'waitlisted' "
+            "ORDER BY id LIMIT %s)",
+            (event_id, limit)
+        )
+        return cur.rowcount
+
+    def link_users(self, cur, first_id, last_id):
+        cur.execute(
+            "UPDATE registrations SET user_id = (SELECT u.id FROM users u WHERE u.email = registrations.email) "
+            "WHERE id BETWEEN %s AND %s AND user_id IS NULL "
+            "AND email IN (SELECT email FROM users)",
+            (first_id, last_id)
+        )
+        return cur.rowcount
+
+
+class SQLiteUserRepository(SQLiteFullTextSearch, UserRepository):
+
+    SEARCH_FTS_TABLE = 'users_fts'
+
+
+class SQLiteAnalyticsRepository(SQLiteLocking, AnalyticsRepository):
+
+    HOUR_OF = "strftime('%%Y-%%m-%%d %%H:00:00', {value})"
+    HOURS_BEFORE = "datetime({value}, '-' || %s || ' hours')"
+    DAYS_BEFORE = "date({value}, '-' || %s || ' days')"
+    NOW = "'now'"
+    TODAY = "'now'"
+
+
+def sqlite_upgrades(version):
+    """The SQLITE_UPGRADES statements a database at `version` needs (none for a new one)."""
+    if not version:
+        return []
+    return [statement for upgrade, statements in SQLITE_UPGRADES if upgrade > version
+            for statement in statements]
+
+
+def script_statements(script):
+    """Split an SQL script into statements; trigger bodies stay whole."""
+    statements, current = [], ''
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ''
+    return statements
+
+
+@lru_cache(maxsize=1024)
+def qmark(query):
+    """A %s-style statement in sqlite3's ? style (%% becomes a literal %)."""
+    return re.sub(r'%([s%])', lambda match: '?' if match.group(1) == 's' else '%', query)
+
+
+class SQLiteCursor:
+    """sqlite3 cursor accepting the %s placeholders the repositories use."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        self._cursor.execute(qmark(query), args or ())
+        return self._cursor.rowcount
+
+    def executemany(self, query, args):
+        self._cursor.executemany(qmark(query), args)
+        return self._cursor.rowcount
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the parts of the MySQLdb interface the app uses."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, cursorclass=None):
+        return SQLiteCursor(self._connection.cursor())
+
+    def ping(self):
+        """Nothing to check: the database is a local file."""
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class SQLiteStorage:
+    """An embedded SQLite database file (DB_BACKEND=sqlite)."""
+
+    name = 'sqlite'
+    Error = sqlite3.Error
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA foreign_keys = ON",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -65536",
+        "PRAGMA mmap_size = 268435456",
+    )
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, busy_timeout=5.0, cached_statements=256):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.events = SQLiteEventRepository()
+        self.registrations = SQLiteRegistrationRepository()
+        self.users = SQLiteUserRepository()
+        self.analytics = SQLiteAnalyticsRepository()
+        self._prepared = False
+
+    @property
+    def target(self):
+        """The database this storage reads and writes, for messages."""
+        return f"SQLite file {os.path.abspath(self.path)}"
+
+    def _open(self):
+        # Pooled connections move between threads, one at a time
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False,
+                                     cached_statements=self.cached_statements)
+        for pragma in self.PRAGMAS:
+            connection.execute(pragma)
+        return connection
+
+    def connect(self):
+        self.prepare()
+        return SQLiteConnection(self._open())
+
+    def is_retryable(self, error):
+        # The busy timeout ran out waiting for another writer
+        return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+    def streaming_cursor(self, connection):
+        """sqlite3 steps through rows as they are fetched, so any cursor streams."""
+        return connection.cursor()
+
+    def reset_tables(self, cur, tables):
+        """Empty tables in order; SQLite has no TRUNCATE."""
+        for table in tables:
+            cur.execute(f"DELETE FROM {table}")
+
+    def prepare(self):
+        """Create the schema in a new database file, or upgrade an older one.
+
+        An empty file counts as new. Everything runs in one BEGIN IMMEDIATE
+        transaction, so workers starting together do it once.
+        """
+        if self._prepared:
+            return
+        connection = self._open()
+        connection.isolation_level = None  # the transaction below is explicit
+        try:
+            if connection.execute("PRAGMA user_version").fetchone()[0] < SQLITE_SCHEMA_VERSION:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    # Read again under the write lock: another worker may have done it
+                    version = connection.execute("PRAGMA user_version").fetchone()[0]
+                    if version < SQLITE_SCHEMA_VERSION:
+                        with open(SQLITE_SCHEMA, encoding='utf-8') as f:
+                            schema = script_statements(f.read())
+                        for statement in sqlite_upgrades(version) + schema:
+                            connection.execute(statement)
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+        finally:
+            connection.close()
+        self._prepared = True
+
+
+def create(config):
+    """The storage backend named by config['DB_BACKEND'] (app.config or os.environ)."""
+    backend = (config.get('DB_BACKEND') or 'mysql').lower()
+    if backend == 'sqlite':
+        return SQLiteStorage(
+            config.get('SQLITE_PATH') or DEFAULT_SQLITE_PATH,
+            busy_timeout=float(config.get('SQLITE_BUSY_TIMEOUT') or 5)
+        )
+    if backend == 'mysql':
+        return MySQLStorage(
+            host=config.get('MYSQL_HOST'),
+            user=config.get('MYSQL_USER'),
+            password=config.get('MYSQL_PASSWORD'),
+            database=config.get('MYSQL_DB')
+        )
+    raise ValueError(f"Unknown DB_BACKEND {backend!r}: use mysql or sqlite")
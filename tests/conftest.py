@@ -0,0 +1,51 @@
+"""Shared fixtures: each test gets its own SQLite database (DB_BACKEND=sqlite)."""
+import os
+
+import pytest
+
+import db
+from storage import create as create_storage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """A prepared SQLite storage in tmp_path, installed as db.storage with a db.pool."""
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'ems.db'))
+    store = create_storage(os.environ)
+    store.prepare()
+    pool = db.ConnectionPool(store.connect, errors=store.Error, size=2)
+    monkeypatch.setattr(db, 'storage', store)
+    monkeypatch.setattr(db, 'pool', pool)
+    yield store
+    pool.close_all()
+
+
+@pytest.fixture
+def connection(storage):
+    connection = storage.connect()
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def make_event(storage, connection):
+    """Create an event with the given capacity (None: unlimited) and return its id."""
+    def make(capacity=None, name='Hackathon'):
+        cur = connection.cursor()
+        event_id = storage.events.create(cur, name, '2030-01-15', '10:00', 'Main Auditorium', capacity)
+        connection.commit()
+        cur.close()
+        return event_id
+    return make
+
+
+@pytest.fixture
+def attendees(storage, connection):
+    """{email: status} of an event's registrations."""
+    def attendees(event_id):
+        cur = connection.cursor()
+        rows = storage.registrations.for_event(cur, event_id)
+        cur.close()
+        return {email: status for _, _, email, status in rows}
+    return attendees
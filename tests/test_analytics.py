@@ -0,0 +1,86 @@
+import pytest
+
+import analytics
+from registrations import link_users
+
+
+@pytest.fixture
+def signups(storage, connection, make_event):
+    """Add backdated registrations; (name, email, created_at) for one event."""
+    event_id = make_event()
+    cur = connection.cursor()
+    storage.users.create(cur, 'STD0000001', 'Ada', 'ada@example.com', 'hash', semester=3, year=2)
+    connection.commit()
+    cur.close()
+
+    def add(*rows):
+        cur = connection.cursor()
+        storage.registrations.insert_backdated(cur, [(event_id, name, email, created_at)
+                                                     for name, email, created_at in rows])
+        connection.commit()
+        cur.close()
+        link_users(connection)
+    add.event_id = event_id
+    return add
+
+
+def rollups(connection):
+    cur = connection.cursor()
+    tables = {}
+    for table in ('registration_rollup_hourly', 'registration_rollup_daily'):
+        cur.execute(f"SELECT bucket, event_id, semester, year, signups FROM {table} ORDER BY 1, 2, 3, 4")
+        tables[table] = cur.fetchall()
+    cur.close()
+    return tables
+
+
+def test_compaction_rerun_leaves_counts_unchanged(connection, signups):
+    signups(('Ada', 'ada@example.com', '2026-03-01 09:15:00'),
+            ('Bob', 'bob@example.com', '2026-03-01 09:40:00'),
+            ('Cy', 'cy@example.com', '2026-03-01 23:05:00'),
+            ('Di', 'di@example.com', '2026-03-02 00:30:00'))
+
+    assert analytics.compact(connection) == 4
+    first = rollups(connection)
+    event_id = signups.event_id
+    assert first == {
+        'registration_rollup_hourly': [
+            ('2026-03-01 09:00:00', event_id, 0, 0, 1),
+            ('2026-03-01 09:00:00', event_id, 3, 2, 1),
+            ('2026-03-01 23:00:00', event_id, 0, 0, 1),
+            ('2026-03-02 00:00:00', event_id, 0, 0, 1),
+        ],
+        'registration_rollup_daily': [
+            ('2026-03-01', event_id, 0, 0, 2),
+            ('2026-03-01', event_id, 3, 2, 1),
+            ('2026-03-02', event_id, 0, 0, 1),
+        ],
+    }
+
+    # Only the last REWRITE_HOURS are recounted, and recounting adds nothing
+    assert analytics.compact(connection) == 2
+    assert rollups(connection) == first
+    analytics.compact(connection, rebuild=True)
+    assert rollups(connection) == first
+
+
+def test_compaction_picks_up_late_signups_once(connection, signups):
+    signups(('Ada', 'ada@example.com', '2026-03-01 09:15:00'),
+            ('Bob', 'bob@example.com', '2026-03-02 00:30:00'))
+    analytics.compact(connection)
+
+    # Committed late, inside the recounted window
+    signups(('Cy', 'cy@example.com', '2026-03-01 23:59:00'),
+            ('Di', 'di@example.com', '2026-03-02 00:45:00'))
+    analytics.compact(connection)
+    analytics.compact(connection)
+
+    event_id = signups.event_id
+    assert rollups(connection)['registration_rollup_daily'] == [
+        ('2026-03-01', event_id, 0, 0, 1),
+        ('2026-03-01', event_id, 3, 2, 1),
+        ('2026-03-02', event_id, 0, 0, 2),
+    ]
+    before_rebuild = rollups(connection)
+    analytics.compact(connection, rebuild=True)
+    assert rollups(connection) == before_rebuild
@@ -0,0 +1,74 @@
+import pytest
+
+import migrate
+
+TRIGGER_SCRIPT = """
+-- Counts per event
+CREATE TABLE counts (event_id INT PRIMARY KEY, n INT NOT NULL);
+
+DELIMITER //
+CREATE TRIGGER trg_count AFTER INSERT ON registrations
+FOR EACH ROW
+BEGIN
+    UPDATE counts SET n = n + 1 WHERE event_id = NEW.event_id;
+    INSERT IGNORE INTO counts VALUES (NEW.event_id, 1);
+END//
+
+CREATE TRIGGER trg_uncount AFTER DELETE ON registrations
+FOR EACH ROW
+BEGIN
+    UPDATE counts SET n = n - 1 WHERE event_id = OLD.event_id;
+END//
+DELIMITER ;
+
+INSERT INTO counts SELECT event_id, COUNT(*) FROM registrations GROUP BY event_id;
+SELECT 1
+"""
+
+
+def test_split_statements_honours_delimiter_blocks():
+    statements = migrate.split_statements(TRIGGER_SCRIPT)
+
+    assert len(statements) == 5
+    assert statements[0] == "CREATE TABLE counts (event_id INT PRIMARY KEY, n INT NOT NULL)"
+    # The trigger bodies keep their inner semicolons and lose the // delimiter
+    assert statements[1].startswith("CREATE TRIGGER trg_count")
+    assert statements[1].endswith("INSERT IGNORE INTO counts VALUES (NEW.event_id, 1);\nEND")
+    assert statements[2].startswith("CREATE TRIGGER trg_uncount")
+    assert statements[2].endswith("END")
+    assert statements[3].startswith("INSERT INTO counts SELECT")
+    # A last statement without a delimiter is kept
+    assert statements[4] == "SELECT 1"
+
+
+def test_split_statements_skips_comments_and_blank_lines():
+    assert migrate.split_statements("\n-- nothing yet\n\n;\n") == []
+
+
+def test_repository_migrations_split():
+    for version, name, path in migrate.discover():
+        if path.endswith('.sql'):
+            with open(path, encoding='utf-8') as f:
+                statements = migrate.split_statements(f.read())
+            assert statements, f"{version}_{name} has no statements"
+            assert not any('DELIMITER' in statement for statement in statements)
+
+
+MIGRATIONS = [(version, f'step{version}', f'{version}_step.sql') for version in ('001', '002', '008', '010')]
+
+
+def test_baseline_compares_versions_numerically(connection):
+    migrate.baseline(connection, '2', MIGRATIONS)
+
+    # "2" means 002; compared as strings, "008" and "010" would sort before it
+    assert migrate.applied_versions(connection) == {'001', '002'}
+
+    migrate.baseline(connection, '0010', MIGRATIONS)
+    assert migrate.applied_versions(connection) == {'001', '002', '008', '010'}
+
+
+def test_baseline_rejects_non_numeric_versions(connection):
+    with pytest.raises(SystemExit):
+        migrate.baseline(connection, '002_event_capacity', MIGRATIONS)
+    with pytest.raises(SystemExit):
+        migrate.baseline(connection, '-1', MIGRATIONS)
@@ -0,0 +1,80 @@
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import ratelimit
+from ratelimit import Limit, MemoryBuckets, RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock the test moves by hand."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(ratelimit, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_burst_then_wait(clock):
+    buckets = MemoryBuckets()
+
+    assert [buckets.take('k', 2.0, 3) for _ in range(3)] == [0, 0, 0]
+    # Empty: the next token arrives in 1 / rate seconds
+    assert buckets.take('k', 2.0, 3) == pytest.approx(0.5)
+
+
+def test_tokens_refill_at_rate(clock):
+    buckets = MemoryBuckets()
+    for _ in range(3):
+        buckets.take('k', 2.0, 3)
+
+    clock.now += 0.25
+    # Half a token: the other half takes another 0.25 seconds
+    assert buckets.take('k', 2.0, 3) == pytest.approx(0.25)
+    clock.now += 0.5
+    assert buckets.take('k', 2.0, 3) == 0
+    assert buckets.take('k', 2.0, 3) > 0
+
+
+def test_refill_is_capped_at_burst(clock):
+    buckets = MemoryBuckets()
+    buckets.take('k', 1.0, 2)
+
+    clock.now += 3600
+    assert [buckets.take('k', 1.0, 2) for _ in range(2)] == [0, 0]
+    assert buckets.take('k', 1.0, 2) > 0
+
+
+def test_keys_have_separate_buckets_and_old_ones_are_dropped(clock):
+    buckets = MemoryBuckets(max_keys=2)
+    buckets.take('a', 1.0, 1)
+    assert buckets.take('b', 1.0, 1) == 0
+    assert buckets.take('a', 1.0, 1) > 0
+
+    buckets.take('c', 1.0, 1)   # evicts 'b', the least recently used
+    assert buckets.take('b', 1.0, 1) == 0
+
+
+def test_login_bucket_is_per_account_and_client(clock):
+    app = Flask(__name__)
+    limiter = RateLimiter(MemoryBuckets())
+    login = Limit('login_account', 2, 60, ratelimit.form_field_from_client('email'))
+
+    @app.route('/', methods=['POST'])
+    @limiter.limit(login)
+    def index():
+        return 'ok'
+
+    client = app.test_client()
+
+    def attempt(ip, email='victim@example.com'):
+        return client.post('/', data={'email': email}, environ_base={'REMOTE_ADDR': ip})
+
+    assert [attempt('10.0.0.1').status_code for _ in range(2)] == [200, 200]
+    blocked = attempt('10.0.0.1')
+    assert blocked.status_code == 429
+    assert blocked.headers['Retry-After'] == '30'
+    # The attacker's failures leave the victim's own budget alone
+    assert attempt('10.0.0.2').status_code == 200
+    assert attempt('10.0.0.1', email='other@example.com').status_code == 200
+    assert limiter.stats() == {'login_account': 1}
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+import registration_queue
+from registration_queue import ERROR, PROCESSING, QUEUED, RegistrationQueue
+from registrations import DUPLICATE, NOT_FOUND, REGISTERED, WAITLISTED
+
+
+@pytest.fixture
+def queue(storage, tmp_path, monkeypatch):
+    """A queue whose batches the test drains itself, with no worker thread."""
+    writes = []
+    queue = RegistrationQueue(str(tmp_path / 'queue.db'), batch_size=2,
+                              on_write=lambda: writes.append(True))
+    monkeypatch.setattr(queue, 'start_worker', lambda: None)
+    queue.writes = writes
+    return queue
+
+
+def state(queue, ticket):
+    return queue.status(ticket)['state']
+
+
+def test_tickets_wait_until_a_batch_is_flushed(queue, make_event, attendees):
+    event_id = make_event(capacity=1)
+    ticket = queue.enqueue(event_id, 'a', 'a@example.com')
+
+    assert state(queue, ticket) == QUEUED
+    assert attendees(event_id) == {}
+
+
+def test_flush_drains_in_batches_in_arrival_order(queue, make_event, attendees):
+    event_id = make_event(capacity=2)
+    tickets = [queue.enqueue(event_id, name, f'{name}@example.com') for name in 'abc']
+
+    assert queue.process_batch() == 2
+    assert [state(queue, ticket) for ticket in tickets] == [REGISTERED, REGISTERED, QUEUED]
+    assert queue.process_batch() == 1
+    assert state(queue, tickets[2]) == WAITLISTED
+    assert queue.process_batch() == 0
+
+    assert attendees(event_id) == {'a@example.com': REGISTERED, 'b@example.com': REGISTERED,
+                                   'c@example.com': WAITLISTED}
+    assert queue.status(tickets[0])['processed_at'] is not None
+    assert len(queue.writes) == 2
+
+
+def test_flush_reports_duplicates_and_unknown_events(queue, make_event):
+    event_id = make_event()
+    first = queue.enqueue(event_id, 'a', 'a@example.com')
+    queue.process_batch()
+    writes = len(queue.writes)
+
+    again = queue.enqueue(event_id, 'a', 'A@example.com')
+    missing = queue.enqueue(999, 'b', 'b@example.com')
+    queue.process_batch()
+
+    assert [state(queue, ticket) for ticket in (first, again, missing)] == [REGISTERED, DUPLICATE, NOT_FOUND]
+    # Nothing was written, so cached pages are left alone
+    assert len(queue.writes) == writes
+
+
+def test_failed_flush_requeues_then_gives_up(queue, make_event, attendees, monkeypatch):
+    event_id = make_event()
+    ticket = queue.enqueue(event_id, 'a', 'a@example.com')
+
+    def fail(attendees):
+        raise RuntimeError("database is down")
+    monkeypatch.setattr(queue, '_write', fail)
+
+    for _ in range(registration_queue.MAX_ATTEMPTS - 1):
+        with pytest.raises(RuntimeError):
+            queue.process_batch()
+        assert state(queue, ticket) == QUEUED
+        assert queue.status(ticket)['message'] == "database is down"
+    with pytest.raises(RuntimeError):
+        queue.process_batch()
+
+    assert state(queue, ticket) == ERROR
+    assert queue.process_batch() == 0
+    assert attendees(event_id) == {}
+
+
+def test_stale_claims_are_queued_again(queue, make_event, monkeypatch):
+    event_id = make_event()
+    ticket = queue.enqueue(event_id, 'a', 'a@example.com')
+    # A worker claimed the ticket and crashed before writing it
+    assert len(queue.claim(10)) == 1
+    assert state(queue, ticket) == PROCESSING
+    assert queue.process_batch() == 0
+
+    later = time.time() + registration_queue.STALE_AFTER + 1
+    monkeypatch.setattr(registration_queue.time, 'time', lambda: later)
+
+    assert queue.process_batch() == 1
+    assert state(queue, ticket) == REGISTERED
@@ -0,0 +1,104 @@
+import registrations
+from registrations import DUPLICATE, NOT_FOUND, REGISTERED, WAITLISTED
+
+
+def register(connection, event_id, *emails):
+    return [registrations.register_attendee(connection, event_id, email.split('@')[0], email)
+            for email in emails]
+
+
+def test_capacity_is_enforced_and_the_rest_waitlisted(connection, make_event, attendees):
+    event_id = make_event(capacity=2)
+
+    statuses = register(connection, event_id, 'a@example.com', 'b@example.com', 'c@example.com')
+
+    assert statuses == [REGISTERED, REGISTERED, WAITLISTED]
+    assert attendees(event_id) == {'a@example.com': REGISTERED, 'b@example.com': REGISTERED,
+                                   'c@example.com': WAITLISTED}
+
+
+def test_unlimited_event_registers_everyone(connection, make_event):
+    event_id = make_event(capacity=None)
+
+    assert register(connection, event_id, 'a@example.com', 'b@example.com') == [REGISTERED, REGISTERED]
+
+
+def test_duplicate_email_takes_no_seat(connection, make_event, attendees):
+    event_id = make_event(capacity=2)
+    register(connection, event_id, 'a@example.com')
+
+    # Emails match case-insensitively, on the seat and on the waitlist
+    assert register(connection, event_id, 'A@Example.com') == [DUPLICATE]
+    assert register(connection, event_id, 'b@example.com', 'c@example.com') == [REGISTERED, WAITLISTED]
+    assert register(connection, event_id, 'c@example.com') == [DUPLICATE]
+    assert attendees(event_id) == {'a@example.com': REGISTERED, 'b@example.com': REGISTERED,
+                                   'c@example.com': WAITLISTED}
+
+
+def test_unknown_event(connection):
+    assert register(connection, 999, 'a@example.com') == [NOT_FOUND]
+
+
+def test_promote_waitlist_fills_new_seats_oldest_first(storage, connection, make_event, attendees):
+    event_id = make_event(capacity=1)
+    register(connection, event_id, 'a@example.com', 'b@example.com', 'c@example.com', 'd@example.com')
+    # A repeated sign-up must not move c ahead of b, or add a row
+    register(connection, event_id, 'c@example.com')
+
+    cur = connection.cursor()
+    storage.events.update(cur, event_id, capacity=3)
+    promoted = registrations.promote_waitlist(cur, event_id)
+    connection.commit()
+    cur.close()
+
+    assert promoted == 2
+    assert attendees(event_id) == {'a@example.com': REGISTERED, 'b@example.com': REGISTERED,
+                                   'c@example.com': REGISTERED, 'd@example.com': WAITLISTED}
+
+
+def test_promote_waitlist_without_free_seats(storage, connection, make_event, attendees):
+    event_id = make_event(capacity=1)
+    register(connection, event_id, 'a@example.com', 'b@example.com')
+
+    cur = connection.cursor()
+    assert registrations.promote_waitlist(cur, event_id) == 0
+    # Lowering the capacity below the seats taken promotes nobody either
+    storage.events.update(cur, event_id, capacity=0)
+    assert registrations.promote_waitlist(cur, event_id) == 0
+    connection.commit()
+    cur.close()
+
+    assert attendees(event_id)['b@example.com'] == WAITLISTED
+
+
+def test_promote_waitlist_when_capacity_is_removed(storage, connection, make_event, attendees):
+    event_id = make_event(capacity=1)
+    register(connection, event_id, 'a@example.com', 'b@example.com', 'c@example.com')
+
+    cur = connection.cursor()
+    storage.events.update(cur, event_id, capacity=None)
+    assert registrations.promote_waitlist(cur, event_id) == 2
+    connection.commit()
+    cur.close()
+
+    assert set(attendees(event_id).values()) == {REGISTERED}
+
+
+def test_register_batch_hands_out_seats_in_list_order(connection, make_event, attendees):
+    event_id = make_event(capacity=2)
+    register(connection, event_id, 'a@example.com')
+
+    cur = connection.cursor()
+    statuses = registrations.register_batch(cur, [
+        (event_id, 'b', 'b@example.com'),
+        (event_id, 'a', 'a@example.com'),   # already registered
+        (event_id, 'c', 'c@example.com'),
+        (event_id, 'B', 'B@example.com'),   # repeated earlier in the batch
+        (999, 'd', 'd@example.com'),
+    ])
+    connection.commit()
+    cur.close()
+
+    assert statuses == [REGISTERED, DUPLICATE, WAITLISTED, DUPLICATE, NOT_FOUND]
+    assert attendees(event_id) == {'a@example.com': REGISTERED, 'b@example.com': REGISTERED,
+                                   'c@example.com': WAITLISTED}